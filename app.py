@@ -1,23 +1,122 @@
 import os
+import sys
 import logging
 import asyncio
 import aiohttp
 import aiohttp.client_exceptions
 from bs4 import BeautifulSoup
 from telegram import Bot, error
-from flask import Flask, jsonify
+from telegram.request import HTTPXRequest
+from aiohttp import web
 import threading
+import socket
 import time
 import hashlib
-from datetime import datetime
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 import xml.etree.ElementTree as ET
 import re
+import html
+import sqlite3
+import json
+import zlib
+import random
+from collections import deque, namedtuple
+from bisect import bisect_left
+from contextlib import contextmanager
+import functools
+from urllib.parse import urlsplit, urljoin
+import heapq
+import math
+import operator
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+try:
+    import yaml  # اختياري: لملفات المصادر بصيغة YAML
+except ImportError:
+    yaml = None
+try:
+    import redis  # اختياري: لتنسيق عدة نسخ عبر Redis
+except ImportError:
+    redis = None
+try:
+    from lxml import etree as lxml_etree  # تحليل HTML السريع (وبدونه BeautifulSoup)
+except ImportError:
+    lxml_etree = None
+try:
+    from lxml.cssselect import CSSSelector  # اختياري: محددات CSS في ملف المصادر (وإلا XPath فقط)
+except ImportError:
+    CSSSelector = None
 
 # ========== إعدادات ==========
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 # مهم: يجب أن يكون معرف القناة (يبدأ بـ @) وليس رابط
 CHANNEL_USERNAME = os.getenv('CHANNEL_USERNAME', '@DO_IUi')
 CHECK_INTERVAL = int(os.getenv('CHECK_INTERVAL', '600'))  # 10 دقائق
+# حدود الفترة التكيفية لكل مصدر
+FEED_MIN_INTERVAL = int(os.getenv('FEED_MIN_INTERVAL', '120'))
+FEED_MAX_INTERVAL = int(os.getenv('FEED_MAX_INTERVAL', '3600'))
+# مخزن الأخبار المرسلة (يبقى بعد إعادة التشغيل)
+SENT_DB_PATH = os.getenv('SENT_DB_PATH', 'sent_articles.db')
+SENT_TTL = int(os.getenv('SENT_TTL', str(7 * 24 * 3600)))  # أسبوع
+SENT_MAX = int(os.getenv('SENT_MAX', '50000'))
+# ذاكرة المصادر (مدققات HTTP وآخر أخبار كل مصدر) لبداية دافئة بعد إعادة التشغيل، فارغ = معطلة
+FEED_CACHE_PATH = os.getenv('FEED_CACHE_PATH', SENT_DB_PATH)
+RSS_ITEM_LIMIT = 12  # أقصى عدد أخبار من كل مصدر
+# حدود الجلب: إجمالي الطلبات المتزامنة ولكل موقع
+FETCH_CONCURRENCY = int(os.getenv('FETCH_CONCURRENCY', '50'))
+FETCH_PER_HOST = int(os.getenv('FETCH_PER_HOST', '4'))
+FETCH_TIMEOUT = float(os.getenv('FETCH_TIMEOUT', '15'))
+# تحليل HTML و XML الكامل خارج حلقة asyncio: process | thread | inline
+PARSE_MODE = os.getenv('PARSE_MODE', 'process')
+PARSE_WORKERS = int(os.getenv('PARSE_WORKERS', str(os.cpu_count() or 1)))
+PARSE_QUEUE_LIMIT = int(os.getenv('PARSE_QUEUE_LIMIT', str(PARSE_WORKERS * 2)))
+# قاطع الدائرة: بعد BREAKER_THRESHOLD أخطاء متتالية يُتجاهل الموقع مؤقتاً
+BREAKER_THRESHOLD = int(os.getenv('BREAKER_THRESHOLD', '3'))
+BREAKER_BASE_DELAY = float(os.getenv('BREAKER_BASE_DELAY', '60'))
+BREAKER_MAX_DELAY = float(os.getenv('BREAKER_MAX_DELAY', '3600'))
+# ملف كلمات مفتاحية اختياري (JSON: {"تصنيف": ["كلمة", ...]}) يُعاد تحميله عند تعديله
+KEYWORDS_FILE = os.getenv('KEYWORDS_FILE')
+# ملف المصادر (JSON أو YAML أو SQLite بجدول feeds) يُعاد تحميله عند تعديله، وبدونه تُستخدم RSS_FEEDS:
+# [{"url": "...", "category": "نفط", "source": "Nasdaq", "parser": "auto|rss|atom|html", "item_limit": 12, "interval": 600, "enabled": true, "weight": 1.0}]
+# source: اسم المصدر في الرسائل وفي سمعة المصادر (افتراضياً name ثم اسم الموقع)
+# category: تصنيف أخبار المصدر التي لا تطابق أي كلمة مفتاحية (بدونه تبقى "عام")
+# weight: سمعة المصدر في ترتيب الأخبار (المصادر بنفس الاسم تتشارك وزناً واحداً)
+# interval: أقصر فترة فحص للمصدر بالثواني (تطول تلقائياً عند الهدوء حتى FEED_MAX_INTERVAL)
+# selectors (لصفحات HTML، XPath أو CSS): {"item": "//article", "title": ".//h2", "link": ".//a/@href", "time": ".//time/@datetime"}
+FEEDS_FILE = os.getenv('FEEDS_FILE')
+FEEDS_RELOAD_INTERVAL = int(os.getenv('FEEDS_RELOAD_INTERVAL', '60'))
+# الأخبار المتشابهة من مصادر مختلفة (MinHash)
+# 0.8: عناوين تختلف في كلمة الاتجاه فقط ("Settle Higher"/"Settle Lower") تبقى منفصلة
+NEAR_DUP_THRESHOLD = float(os.getenv('NEAR_DUP_THRESHOLD', '0.8'))
+NEAR_DUP_MIN_SHINGLES = int(os.getenv('NEAR_DUP_MIN_SHINGLES', '6'))  # النص الأقصر لا يُقارن (تقدير غير موثوق)
+NEAR_DUP_WINDOW = int(os.getenv('NEAR_DUP_WINDOW', str(24 * 3600)))  # يوم
+# ترتيب الأخبار: أعلى K مهمة (أو عامة إن لم توجد) حسب الدرجة
+RANK_TOP_K = int(os.getenv('RANK_TOP_K', '5'))
+RANK_GENERAL_K = int(os.getenv('RANK_GENERAL_K', '3'))
+RANK_WINDOW = int(os.getenv('RANK_WINDOW', str(CHECK_INTERVAL)))  # الحصتان لكل قناة خلال هذه المدة
+RANK_HALF_LIFE = float(os.getenv('RANK_HALF_LIFE', str(6 * 3600)))  # الدرجة تنتصف كل 6 ساعات من النشر
+RANK_CORROBORATION_BONUS = float(os.getenv('RANK_CORROBORATION_BONUS', '0.5'))  # لكل مصدر إضافي نقل الخبر
+# وزن كل تصنيف (JSON): {"نفط": 1.5, "عام": 0.5}، الافتراضي 1
+CATEGORY_WEIGHTS = json.loads(os.getenv('CATEGORY_WEIGHTS', '{}'))
+# الدورة كمراحل متصلة: أخبار كل مصدر تُصفّى وتُرسل فور وصولها بدل انتظار أبطأ مصدر
+PIPELINE_WINDOW = float(os.getenv('PIPELINE_WINDOW', '2'))  # ثوانٍ لتجميع الواصل قبل الترتيب والإرسال
+PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', '64'))  # مصادر محللة بانتظار التصفية (backpressure)
+# حدود تليجرام: 30 رسالة/ثانية للبوت و20 رسالة/دقيقة لكل قناة
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', 'https://api.telegram.org')
+TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', '30'))  # رسالة/ثانية
+TELEGRAM_CHAT_RATE = float(os.getenv('TELEGRAM_CHAT_RATE', '20'))  # رسالة/دقيقة
+SEND_MAX_RETRIES = int(os.getenv('SEND_MAX_RETRIES', '5'))
+SEND_DIGEST = os.getenv('SEND_DIGEST', '0') == '1'  # دمج الأخبار العامة في رسالة واحدة
+MESSAGE_FORMAT = os.getenv('MESSAGE_FORMAT', 'html')  # html | markdownv2 | plain
+MESSAGE_LIMIT = 4000
+# تشغيل عدة نسخ بدون تكرار: sqlite:///path/coord.db أو redis://host:6379/0 (فارغ = نسخة واحدة)
+COORDINATION_URL = os.getenv('COORDINATION_URL')
+INSTANCE_ID = os.getenv('INSTANCE_ID') or f"{socket.gethostname()}-{os.getpid()}"
+LEASE_TTL = float(os.getenv('LEASE_TTL', '60'))  # النسخة التي لا تجدد حجزها خلالها تُعتبر متوقفة
+# قنوات متعددة (JSON): [{"chat_id": "@OilNews", "categories": ["نفط"], "sources": [], "rate": 20, "digest": false}]
+# categories/sources فارغة = كل الأخبار. بدون الملف: قناة واحدة هي CHANNEL_USERNAME
+CHANNELS_FILE = os.getenv('CHANNELS_FILE')
 
 if not TELEGRAM_BOT_TOKEN:
     raise ValueError("❌ TELEGRAM_BOT_TOKEN غير محدد.")
@@ -33,8 +132,144 @@ elif not CHANNEL_USERNAME.startswith('@'):
 
 logging.info(f"📢 القناة المضبوطة: {CHANNEL_USERNAME}")
 
-# ========== Flask App ==========
-app = Flask(__name__)
+# ========== المقاييس (بصيغة Prometheus) ==========
+# عدادات ومدرجات خفيفة في الذاكرة: التسجيل مجرد زيادة في قاموس،
+# والنص يُبنى فقط عند طلب /metrics
+METRICS = []
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values = {}
+        METRICS.append(self)
+
+    def inc(self, *label_values, amount=1):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for label_values, value in self._values.items():
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value}")
+        return lines
+
+class Gauge:
+    """قيمة لحظية تُقرأ من دالة عند الطلب فقط"""
+
+    def __init__(self, name, help_text, labels, read):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.read = read  # -> {(قيم التسميات): القيمة}
+        METRICS.append(self)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        for label_values, value in self.read().items():
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value}")
+        return lines
+
+class Histogram:
+    DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._values = {}  # التسميات -> [عدادات الفئات..., المجموع, العدد]
+        METRICS.append(self)
+
+    def observe(self, value, *label_values):
+        data = self._values.get(label_values)
+        if data is None:
+            data = self._values[label_values] = [0] * (len(self.buckets) + 2)
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            data[index] += 1
+        data[-2] += value
+        data[-1] += 1
+
+    @contextmanager
+    def time(self, *label_values):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for label_values, data in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, data):
+                cumulative += count
+                labels = _format_labels(self.labels + ('le',), label_values + (bound,))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels + ('le',), label_values + ('+Inf',))
+            lines.append(f"{self.name}_bucket{labels} {data[-1]}")
+            labels = _format_labels(self.labels, label_values)
+            lines.append(f"{self.name}_sum{labels} {data[-2]}")
+            lines.append(f"{self.name}_count{labels} {data[-1]}")
+        return lines
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+def timed_parser(parser_name):
+    """تسجيل زمن المحلل وعدد الأخبار التي أنتجها"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with PARSE_SECONDS.time(parser_name):
+                articles = func(*args, **kwargs)
+            PARSED_ITEMS.inc(parser_name, amount=len(articles))
+            return articles
+        return wrapper
+    return decorator
+
+def render_metrics():
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+FETCH_SECONDS = Histogram('newsbot_fetch_seconds', 'Feed fetch latency', ('source',))
+FETCH_BYTES = Counter('newsbot_fetch_bytes_total', 'Bytes downloaded per feed', ('source',))
+FETCH_RESPONSES = Counter('newsbot_fetch_responses_total', 'HTTP responses per feed and status', ('source', 'status'))
+FETCH_ERRORS = Counter('newsbot_fetch_errors_total', 'Feed fetch failures', ('source', 'error'))
+PARSE_SECONDS = Histogram('newsbot_parse_seconds', 'Parse time per feed', ('parser',))
+PARSED_ITEMS = Counter('newsbot_parsed_items_total', 'Articles produced by each parser', ('parser',))
+CATEGORIZE_SECONDS = Histogram(
+    'newsbot_categorize_seconds', 'Time to categorize the titles of one parsed feed',
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05)
+)
+DEDUP_CHECKS = Counter('newsbot_dedup_checks_total', 'Sent-history lookups per channel', ('channel', 'result'))
+NEAR_DUP_SECONDS = Histogram('newsbot_near_dup_seconds', 'Near-duplicate clustering time per cycle')
+RANK_SECONDS = Histogram('newsbot_rank_seconds', 'Article scoring time per cycle')
+NEAR_DUPLICATES = Counter('newsbot_near_duplicates_dropped_total', 'Articles dropped as near-duplicates')
+SEND_SECONDS = Histogram('newsbot_send_seconds', 'Telegram send_message latency', ('channel',))
+TELEGRAM_ERRORS = Counter('newsbot_telegram_errors_total', 'Telegram API errors', ('channel', 'error'))
+RETRY_AFTER_SECONDS = Counter('newsbot_telegram_retry_after_seconds_total', 'Seconds Telegram asked us to wait', ('channel',))
+LOOP_LAG_SECONDS = Histogram(
+    'newsbot_loop_lag_seconds', 'Event loop scheduling delay measured by a probe task',
+    buckets=(0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1)
+)
+HEADLINE_LATENCY_SECONDS = Histogram(
+    'newsbot_headline_latency_seconds', 'Time from an article arriving in the cycle to its delivery to Telegram', ('channel',),
+    buckets=(0.5, 1, 2.5, 5, 10, 30, 60, 300, 1800)
+)
+CYCLE_SECONDS = Histogram('newsbot_cycle_seconds', 'Full fetch-to-send cycle time', buckets=(1, 2.5, 5, 10, 15, 30, 60, 120))
+
+# ========== خادم الويب (aiohttp على نفس حلقة البوت) ==========
+routes = web.RouteTableDef()
 
 # ========== مصادر RSS مباشرة (بدون Brotli issues) ==========
 RSS_FEEDS = [
@@ -58,157 +293,946 @@ KEYWORDS = {
 }
 
 # تخزين
-sent_articles = set()
+class SentStore:
+    """مخزن دائم ومحدود للأخبار المرسلة (SQLite + واجهة في الذاكرة)
+
+    الفحص `id in store` يتم من الذاكرة فقط، والقرص يُلمس عند الإضافة.
+    الإزالة حسب العمر (SENT_TTL) والحجم (SENT_MAX) معاً، الأقدم أولاً.
+    """
+
+    def __init__(self, path, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._recent = {}  # id -> وقت الإرسال، مرتبة من الأقدم
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sent (id TEXT PRIMARY KEY, sent_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS sent_at_idx ON sent (sent_at)")
+        self._load()
+
+    def _load(self):
+        """تحميل النافذة الحديثة فقط"""
+        cutoff = time.time() - self.ttl
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM sent WHERE sent_at < ?", (cutoff,))
+            rows = self._db.execute(
+                "SELECT id, sent_at FROM sent ORDER BY sent_at DESC LIMIT ?",
+                (self.max_size,)
+            ).fetchall()
+        for article_id, sent_at in reversed(rows):
+            self._recent[article_id] = sent_at
+        logging.info(f"💾 تم تحميل {len(self._recent)} خبر مرسل سابقاً")
+
+    def __contains__(self, article_id):
+        return article_id in self._recent
+
+    def __len__(self):
+        return len(self._recent)
+
+    def add(self, article_id):
+        now = time.time()
+        with self._lock:
+            self._recent.pop(article_id, None)
+            self._recent[article_id] = now
+            with self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO sent (id, sent_at) VALUES (?, ?)",
+                    (article_id, now)
+                )
+            while len(self._recent) > self.max_size:
+                self._recent.pop(next(iter(self._recent)))
+
+    def evict(self):
+        """حذف المنتهي من الذاكرة والقرص"""
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            while self._recent:
+                oldest = next(iter(self._recent))
+                if self._recent[oldest] >= cutoff:
+                    break
+                del self._recent[oldest]
+            with self._db:
+                self._db.execute("DELETE FROM sent WHERE sent_at < ?", (cutoff,))
+                self._db.execute(
+                    "DELETE FROM sent WHERE id NOT IN "
+                    "(SELECT id FROM sent ORDER BY sent_at DESC LIMIT ?)",
+                    (self.max_size,)
+                )
+
+sent_articles = SentStore(SENT_DB_PATH, SENT_TTL, SENT_MAX)
 bot_started = False
+manual_check_requests = asyncio.Queue(maxsize=1)  # فحص يدوي واحد منتظر على الأكثر
+feed_states = {}  # url -> FeedState
+
+class FeedState:
+    """حالة المصدر: مدققات HTTP وبصمة المحتوى وفترة الفحص الخاصة به
+
+    signatures (id -> توقيع MinHash) تُحسب خارج الحلقة مع التحليل وتبقى مع
+    الأخبار، فالأخبار المخزنة (304 أو FeedCache) لا يُعاد توقيعها كل دورة.
+    """
+    __slots__ = ('etag', 'last_modified', 'content_hash', 'articles', 'signatures', 'interval', 'min_interval',
+                 'max_interval', 'next_due')
+
+    def __init__(self):
+        self.etag = None
+        self.last_modified = None
+        self.content_hash = None
+        self.articles = []
+        self.signatures = {}
+        self.min_interval = FEED_MIN_INTERVAL
+        self.max_interval = FEED_MAX_INTERVAL
+        self.interval = min(max(CHECK_INTERVAL, FEED_MIN_INTERVAL), FEED_MAX_INTERVAL)
+        self.next_due = 0.0
+
+    def set_base_interval(self, interval):
+        """فترة المصدر من السجل: أقصر فترة له (والتكيف يطيلها عند الهدوء)، أو None للحدود العامة"""
+        if interval:
+            self.min_interval = interval
+            self.max_interval = max(interval, FEED_MAX_INTERVAL)
+            self.interval = interval
+        else:
+            self.min_interval = FEED_MIN_INTERVAL
+            self.max_interval = FEED_MAX_INTERVAL
+            self.interval = min(max(self.interval, FEED_MIN_INTERVAL), FEED_MAX_INTERVAL)
+
+    def set_articles(self, articles, signatures):
+        """أخبار المصدر الحالية؛ توقيعات الأخبار التي خرجت منها تُحذف"""
+        merged = {**self.signatures, **signatures}
+        self.articles = articles
+        self.signatures = {a.id: merged[a.id] for a in articles if a.id in merged}
+
+    def schedule(self, changed, now):
+        """تقصير الفترة عند وجود جديد وإطالتها عند الهدوء (ضمن حدود المصدر)"""
+        if changed:
+            self.interval = max(self.min_interval, self.interval / 2)
+        else:
+            self.interval = min(self.max_interval, self.interval * 1.5)
+        self.next_due = now + self.interval
+
+def get_feed_state(url):
+    state = feed_states.get(url)
+    if state is None:
+        state = feed_states[url] = FeedState()
+    return state
+
+class FeedCache:
+    """حالة المصادر على القرص (SQLite) لبداية دافئة بعد إعادة التشغيل
+
+    لكل مصدر: ETag و Last-Modified وبصمة المحتوى والفترة وآخر الأخبار
+    المحللة (JSON مضغوط). عند التشغيل تُحمّل إلى feed_states فتكون أول دورة
+    طلبات شرطية (304 غالباً) مع أخبار جاهزة بدل جلب وتحليل كل شيء.
+    """
+
+    def __init__(self, path, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS feed_cache (url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, "
+            "content_hash TEXT, interval REAL, articles BLOB, updated_at REAL NOT NULL)"
+        )
+
+    def load(self):
+        """تحميل الحالات المحفوظة إلى feed_states (كل المصادر مستحقة فوراً)"""
+        started = time.perf_counter()
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM feed_cache WHERE updated_at < ?", (time.time() - self.ttl,))
+            rows = self._db.execute(
+                "SELECT url, etag, last_modified, content_hash, interval, articles FROM feed_cache"
+            ).fetchall()
+        loaded = 0
+        for url, etag, last_modified, content_hash, interval, blob in rows:
+            try:
+                articles = [Article(*row) for row in json.loads(zlib.decompress(blob))] if blob else []
+            except (zlib.error, ValueError, TypeError) as e:
+                # بدون الأخبار لا فائدة من المدققات (304 سيعيد قائمة فارغة)
+                logging.warning(f"⚠️ ذاكرة تالفة للمصدر {url}: {e}")
+                continue
+            state = get_feed_state(url)
+            state.etag = etag
+            state.last_modified = last_modified
+            state.content_hash = content_hash
+            if interval:
+                state.interval = min(max(interval, state.min_interval), state.max_interval)
+            state.articles = [
+                article._replace(type=sys.intern(article.type), source=sys.intern(article.source))
+                for article in articles
+            ]
+            loaded += 1
+        logging.info(f"💾 تم تحميل حالة {loaded} مصدر في {time.perf_counter() - started:.2f} ثانية")
+
+    def _write(self, rows):
+        now = time.time()
+        encoded = [
+            (url, etag, last_modified, content_hash, interval,
+             zlib.compress(json.dumps(articles, ensure_ascii=False).encode()), now)
+            for url, etag, last_modified, content_hash, interval, articles in rows
+        ]
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO feed_cache VALUES (?, ?, ?, ?, ?, ?, ?)", encoded
+            )
+
+    async def save(self, urls):
+        """حفظ حالة المصادر المعطاة في معاملة واحدة (خارج حلقة asyncio)"""
+        rows = []
+        for url in urls:
+            state = feed_states.get(url)
+            if state is not None:
+                rows.append((url, state.etag, state.last_modified, state.content_hash,
+                             state.interval, list(state.articles)))
+        if rows:
+            try:
+                await asyncio.to_thread(self._write, rows)
+            except sqlite3.Error as e:
+                logging.error(f"❌ خطأ في حفظ حالة المصادر: {e}")
+
+feed_cache = FeedCache(FEED_CACHE_PATH, SENT_TTL) if FEED_CACHE_PATH else None
+
+# ========== سجل المصادر ==========
+FEED_PARSERS = ('auto', 'rss', 'atom', 'html')
+
+def _is_xpath(expression):
+    return expression.startswith(('/', './', '(', '@'))
+
+@functools.lru_cache(maxsize=256)
+def compile_selector(expression):
+    """محدد XPath أو CSS مُجمّع مرة واحدة: عنصر -> نتائج"""
+    if lxml_etree is None:
+        raise ValueError("lxml غير مثبت")
+    try:
+        if _is_xpath(expression):
+            return lxml_etree.XPath(expression)
+        if CSSSelector is None:
+            raise ValueError(f"محدد CSS يحتاج cssselect: {expression}")
+        return CSSSelector(expression)
+    except (lxml_etree.XPathError, SyntaxError) as e:
+        raise ValueError(f"محدد غير صالح {expression}: {e}")
+
+class FeedEntry:
+    """مصدر واحد في السجل"""
+    __slots__ = ('url', 'category', 'source', 'parser', 'item_limit', 'interval', 'enabled', 'weight', 'selectors',
+                 'host')
+
+    def __init__(self, url, source, parser='auto', item_limit=RSS_ITEM_LIMIT, interval=None, enabled=True,
+                 weight=1.0, selectors=None, category=None):
+        if parser not in FEED_PARSERS:
+            raise ValueError(f"parser غير معروف: {parser}")
+        if isinstance(selectors, str):
+            selectors = json.loads(selectors)  # عمود نصي في SQLite
+        if selectors:
+            if 'item' not in selectors:
+                raise ValueError("selectors بدون item")
+            for expression in selectors.values():
+                compile_selector(expression)  # خطأ المحدد يظهر عند التحميل لا عند التحليل
+            parser = 'html'
+        self.url = url
+        self.source = source
+        self.category = sys.intern(category) if category else None
+        self.parser = parser
+        self.item_limit = int(item_limit)
+        self.interval = float(interval) if interval else None
+        self.enabled = bool(enabled)
+        self.weight = float(weight)
+        self.selectors = dict(selectors) if selectors else None
+        self.host = urlsplit(url).hostname or url
 
-@app.route('/')
-def home():
-    return jsonify({
+    @classmethod
+    def from_dict(cls, data):
+        host = urlsplit(data['url']).hostname
+        return cls(
+            data['url'],
+            data.get('source') or data.get('name') or host,
+            parser=data.get('parser', 'auto'),
+            item_limit=data.get('item_limit', RSS_ITEM_LIMIT),
+            interval=data.get('interval'),
+            enabled=data.get('enabled', True),
+            weight=data.get('weight', 1.0),
+            selectors=data.get('selectors'),
+            category=data.get('category'),
+        )
+
+def _read_feeds_file(path):
+    """قراءة المصادر من JSON أو YAML أو SQLite"""
+    if path.endswith(('.db', '.sqlite', '.sqlite3')):
+        db = sqlite3.connect(path)
+        try:
+            db.row_factory = sqlite3.Row
+            # SELECT * حتى تبقى الأعمدة الاختيارية (مثل weight) اختيارية
+            rows = db.execute("SELECT * FROM feeds").fetchall()
+        finally:
+            db.close()
+        return [{k: row[k] for k in row.keys() if row[k] is not None} for row in rows]
+    with open(path, encoding='utf-8') as f:
+        if path.endswith(('.yaml', '.yml')):
+            if yaml is None:
+                raise RuntimeError("PyYAML غير مثبت")
+            data = yaml.safe_load(f)
+        else:
+            data = json.load(f)
+    # يقبل قائمة أو {"feeds": [...]}
+    return data['feeds'] if isinstance(data, dict) else data
+
+class FeedRegistry:
+    """سجل المصادر مفهرس حسب موعد الاستحقاق (التزامن لكل موقع في HostState)
+
+    المصادر المستحقة تُسحب من heap بدل المرور على القائمة كلها. العناصر
+    القديمة في heap (بعد تعديل موعد أو حذف مصدر) تُتجاهل عند سحبها.
+    """
+
+    def __init__(self):
+        self.entries = {}  # url -> FeedEntry
+        self.source_weights = {}  # اسم المصدر (FeedEntry.source) -> weight
+        self._heap = []  # (موعد الاستحقاق, url)
+        self._mtime = None
+
+    def set_entries(self, entries):
+        """استبدال المصادر: الجديد مستحق فوراً، والموجود يحتفظ بحالته"""
+        new = {entry.url: entry for entry in entries}
+        for url in self.entries.keys() - new.keys():
+            del self.entries[url]
+        for url, entry in new.items():
+            old = self.entries.get(url)
+            self.entries[url] = entry
+            state = get_feed_state(url)
+            if old is None or old.interval != entry.interval:
+                state.set_base_interval(entry.interval)
+            if entry.enabled and (old is None or not old.enabled):
+                heapq.heappush(self._heap, (state.next_due, url))
+        self.source_weights = {}
+        for entry in self.entries.values():
+            weight = self.source_weights.setdefault(entry.source, entry.weight)
+            if weight != entry.weight:
+                logging.warning(f"⚠️ أوزان مختلفة للمصدر {entry.source}، يُستخدم {weight}")
+
+    def load_file(self, path):
+        entries = []
+        for data in _read_feeds_file(path):
+            try:
+                entries.append(FeedEntry.from_dict(data))
+            except (KeyError, ValueError, TypeError) as e:
+                logging.error(f"❌ مصدر غير صالح في {path}: {data} ({e})")
+        self.set_entries(entries)
+        logging.info(f"📡 تم تحميل {len(entries)} مصدر من {path} ({self.host_count()} موقع)")
+
+    def reload_if_changed(self):
+        """إعادة تحميل FEEDS_FILE عند تعديله بدون إعادة التشغيل"""
+        if not FEEDS_FILE:
+            return
+        try:
+            mtime = os.path.getmtime(FEEDS_FILE)
+            if mtime != self._mtime:
+                self.load_file(FEEDS_FILE)
+                self._mtime = mtime
+        except Exception as e:
+            logging.error(f"❌ خطأ في تحميل {FEEDS_FILE}: {e}")
+
+    def _is_current(self, due, url):
+        entry = self.entries.get(url)
+        return entry is not None and entry.enabled and feed_states[url].next_due == due
+
+    def _drop_stale(self):
+        while self._heap and not self._is_current(*self._heap[0]):
+            heapq.heappop(self._heap)
+
+    def pop_due(self, now):
+        """سحب كل المصادر المستحقة (يجب إعادة جدولتها بعد الجلب)
+
+        المصدر قد يكون في heap مرتين بنفس الموعد (تعطيل ثم تفعيل قبل سحب
+        عنصره القديم)، فيُسحب مرة واحدة.
+        """
+        due = {}
+        self._drop_stale()
+        while self._heap and self._heap[0][0] <= now:
+            _, url = heapq.heappop(self._heap)
+            due.setdefault(url, self.entries[url])
+            self._drop_stale()
+        return list(due.values())
+
+    def reschedule(self, entry):
+        """إعادة المصدر إلى heap حسب موعده الجديد في FeedState"""
+        if self.entries.get(entry.url) is entry and entry.enabled:
+            heapq.heappush(self._heap, (feed_states[entry.url].next_due, entry.url))
+
+    def next_due_time(self):
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else float('inf')
+
+    def mark_all_due(self):
+        """جعل كل المصادر المفعّلة مستحقة الآن"""
+        self._heap = []
+        for url, entry in self.entries.items():
+            if entry.enabled:
+                feed_states[url].next_due = 0.0
+                self._heap.append((0.0, url))
+        heapq.heapify(self._heap)
+
+    def host_count(self):
+        return len({entry.host for entry in self.entries.values()})
+
+    def source_weight(self, source):
+        return self.source_weights.get(source, 1.0)
+
+    def first(self):
+        return next((e for e in self.entries.values() if e.enabled), None)
+
+    def __len__(self):
+        return len(self.entries)
+
+feed_registry = FeedRegistry()
+if FEEDS_FILE:
+    feed_registry.reload_if_changed()
+else:
+    feed_registry.set_entries([FeedEntry(url, name) for name, url in RSS_FEEDS])
+
+@routes.get('/')
+async def home(request):
+    return web.json_response({
         "status": "running",
         "service": "Telegram News Bot",
         "channel": CHANNEL_USERNAME,
+        "channels": [queue.chat_id for queue in channels],
         "bot_started": bot_started,
+        "feeds": len(feed_registry),
         "articles_sent": len(sent_articles),
         "endpoints": {
             "health": "/health",
             "manual_check": "/check",
-            "test_channel": "/test-channel"
+            "test_channel": "/test-channel",
+            "metrics": "/metrics"
         }
     })
 
-@app.route('/health')
-def health():
-    return jsonify({
+@routes.get('/health')
+async def health(request):
+    return web.json_response({
         "status": "healthy",
         "timestamp": datetime.now().isoformat()
-    }), 200
+    }, status=200)
 
-@app.route('/check')
-def manual_check():
-    """فحص يدوي سريع"""
-    threading.Thread(target=run_quick_check).start()
-    return jsonify({
-        "message": "بدأ الفحص اليدوي السريع",
+@routes.get('/check')
+async def manual_check(request):
+    """فحص يدوي سريع (يُضاف للطابور، والطلبات المتكررة تُدمج)"""
+    try:
+        manual_check_requests.put_nowait(time.time())
+        message = "بدأ الفحص اليدوي السريع"
+    except asyncio.QueueFull:
+        message = "يوجد فحص يدوي منتظر بالفعل"
+    return web.json_response({
+        "message": message,
         "time": datetime.now().strftime("%H:%M:%S")
     })
 
-@app.route('/test-channel')
-def test_channel():
+@routes.get('/test-channel')
+async def test_channel(request):
     """اختبار إرسال رسالة إلى القناة"""
-    async def test():
-        try:
-            bot = Bot(token=TELEGRAM_BOT_TOKEN)
-            await bot.send_message(
-                chat_id=CHANNEL_USERNAME,
-                text="✅ اختبار: البوت يعمل بنجاح!\n" +
-                     "سيبدأ إرسال الأخبار الاقتصادية قريباً."
-            )
-            return jsonify({"success": True, "channel": CHANNEL_USERNAME})
-        except error.BadRequest as e:
-            return jsonify({"error": str(e), "channel": CHANNEL_USERNAME}), 400
-        except Exception as e:
-            return jsonify({"error": str(e)}), 500
-    
-    return asyncio.run(test())
+    try:
+        ok = await asyncio.wait_for(send_queue.submit_text(
+            "✅ اختبار: البوت يعمل بنجاح!\n" +
+            "سيبدأ إرسال الأخبار الاقتصادية قريباً."
+        ), timeout=60)
+        if not ok:
+            return web.json_response({"error": "فشل الإرسال", "channel": CHANNEL_USERNAME}, status=500)
+        return web.json_response({"success": True, "channel": CHANNEL_USERNAME})
+    except error.BadRequest as e:
+        return web.json_response({"error": str(e), "channel": CHANNEL_USERNAME}, status=400)
+    except Exception as e:
+        return web.json_response({"error": str(e)}, status=500)
+
+@routes.get('/metrics')
+async def metrics(request):
+    """مقاييس بصيغة Prometheus"""
+    return web.Response(text=render_metrics(), content_type='text/plain', charset='utf-8')
+
+# ========== تنسيق عدة نسخ ==========
+class SQLiteCoordination:
+    """حجوزات مشتركة في ملف SQLite (نسخ على نفس الجهاز أو قرص مشترك)
+
+    الحجز (lease) مفتاح لمالكه حتى تنتهي مدته. الحجز ذري: عبارة واحدة
+    والملف يسمح بكاتب واحد في كل لحظة.
+    """
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS leases_expires_idx ON leases (expires)")
+
+    def acquire_many(self, keys, owner, ttl):
+        """حجز كل مفتاح أو تجديده؛ قائمة نجاح كل مفتاح"""
+        now = time.time()
+        results = []
+        with self._lock:
+            for key in keys:
+                cursor = self._db.execute(
+                    "INSERT INTO leases (key, owner, expires) VALUES (?, ?, ?) "
+                    "ON CONFLICT (key) DO UPDATE SET owner = excluded.owner, expires = excluded.expires "
+                    "WHERE leases.owner = excluded.owner OR leases.expires < ?",
+                    (key, owner, now + ttl, now)
+                )
+                results.append(cursor.rowcount == 1)
+        return results
+
+    def release(self, key, owner):
+        with self._lock:
+            self._db.execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, owner))
+
+    def holders(self, prefix):
+        """مالكو الحجوزات السارية التي تبدأ بـ prefix"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT owner FROM leases WHERE key >= ? AND key < ? AND expires >= ?",
+                (prefix, prefix + '\uffff', time.time())
+            ).fetchall()
+        return {owner for owner, in rows}
+
+    def purge(self):
+        with self._lock:
+            self._db.execute("DELETE FROM leases WHERE expires < ?", (time.time(),))
+
+class RedisCoordination:
+    """نفس الحجوزات في Redis (نسخ على أجهزة مختلفة)"""
+
+    _ACQUIRE = """
+    local current = redis.call('get', KEYS[1])
+    if current == false or current == ARGV[1] then
+        redis.call('set', KEYS[1], ARGV[1], 'PX', ARGV[2])
+        return 1
+    end
+    return 0
+    """
+    _RELEASE = """
+    if redis.call('get', KEYS[1]) == ARGV[1] then
+        return redis.call('del', KEYS[1])
+    end
+    return 0
+    """
+
+    def __init__(self, url, namespace='newsbot:'):
+        if redis is None:
+            raise RuntimeError("مكتبة redis غير مثبتة")
+        self.namespace = namespace
+        self._client = redis.Redis.from_url(url, decode_responses=True)
+        self._acquire = self._client.register_script(self._ACQUIRE)
+        self._release = self._client.register_script(self._RELEASE)
+
+    def acquire_many(self, keys, owner, ttl):
+        pipe = self._client.pipeline(transaction=False)
+        for key in keys:
+            self._acquire(keys=[self.namespace + key], args=[owner, int(ttl * 1000)], client=pipe)
+        return [bool(result) for result in pipe.execute()]
+
+    def release(self, key, owner):
+        self._release(keys=[self.namespace + key], args=[owner])
+
+    def holders(self, prefix):
+        keys = list(self._client.scan_iter(match=f"{self.namespace}{prefix}*"))
+        return {owner for owner in self._client.mget(keys) if owner} if keys else set()
+
+    def purge(self):
+        pass  # Redis يحذف المنتهي بنفسه
+
+class Coordinator:
+    """توزيع العمل بين نسخ البوت
+
+    كل نسخة تجدد حجز عضويتها كل LEASE_TTL/3. المصادر تُقسم بين الأعضاء
+    الأحياء (rendezvous hashing: توقف نسخة ينقل مصادرها فقط)، والمصدر
+    يُحجز قبل جلبه حتى لا تجلبه نسختان أثناء تغير العضوية. كل خبر يُحجز
+    لكل قناة قبل إرساله، فلا يُرسل مرتين مهما حدث.
+    """
+
+    def __init__(self, backend, instance_id=INSTANCE_ID, lease_ttl=LEASE_TTL):
+        self.backend = backend
+        self.instance_id = instance_id
+        self.lease_ttl = lease_ttl
+        self.members = [instance_id]
+
+    async def _call(self, method, *args):
+        return await asyncio.to_thread(method, *args)
+
+    async def heartbeat(self):
+        """تجديد العضوية وتحديث قائمة الأعضاء الأحياء"""
+        await self._call(self.backend.acquire_many, [f"member:{self.instance_id}"], self.instance_id, self.lease_ttl)
+        members = await self._call(self.backend.holders, "member:")
+        await self._call(self.backend.purge)
+        members.add(self.instance_id)
+        if sorted(members) != self.members:
+            logging.info(f"🤝 النسخ النشطة: {len(members)} ({', '.join(sorted(members))})")
+        self.members = sorted(members)
+
+    async def heartbeat_loop(self):
+        while True:
+            try:
+                await self.heartbeat()
+            except Exception as e:
+                logging.error(f"❌ خطأ في تنسيق النسخ: {e}")
+            await asyncio.sleep(self.lease_ttl / 3)
+
+    def owner_of(self, key):
+        return max(self.members, key=lambda member: hashlib.md5(f"{member}|{key}".encode()).digest())
+
+    async def claim_feeds(self, entries):
+        """المصادر التي تجلبها هذه النسخة الآن، والباقي (لنسخة أخرى)"""
+        owned = [entry for entry in entries if self.owner_of(entry.url) == self.instance_id]
+        claimed = await self._call(
+            self.backend.acquire_many, [f"feed:{entry.url}" for entry in owned], self.instance_id, self.lease_ttl
+        )
+        mine = {entry.url for entry, ok in zip(owned, claimed) if ok}
+        return [e for e in entries if e.url in mine], [e for e in entries if e.url not in mine]
+
+    async def claim(self, key, ttl):
+        """حجز مفتاح لمرة واحدة (خبر في قناة، رسالة بدء...)؛ False إذا سبقتنا نسخة أخرى"""
+        claimed, = await self._call(self.backend.acquire_many, [key], self.instance_id, ttl)
+        return claimed
+
+    async def release(self, key):
+        await self._call(self.backend.release, key, self.instance_id)
+
+def make_coordinator(url):
+    if not url:
+        return None
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        backend = RedisCoordination(url)
+    else:
+        backend = SQLiteCoordination(url[len('sqlite:///'):] if url.startswith('sqlite:///') else url)
+    logging.info(f"🤝 تنسيق النسخ: {backend.__class__.__name__} (النسخة {INSTANCE_ID})")
+    return Coordinator(backend)
+
+coordinator = make_coordinator(COORDINATION_URL)
+Gauge('newsbot_replicas', 'Live bot instances sharing the feeds', (),
+      lambda: {(): len(coordinator.members) if coordinator is not None else 1})
+
+# ========== جدولة الجلب ==========
+class HostState:
+    """حدود وقاطع دائرة لموقع واحد
+
+    بعد BREAKER_THRESHOLD أخطاء متتالية (timeout، خطأ شبكة، 5xx، 429) يُفتح
+    القاطع لمدة تتضاعف مع كل فشل إضافي (مع تذبذب عشوائي). بعد انتهائها
+    يُسمح بطلب تجريبي واحد: نجاحه يغلق القاطع وفشله يعيد فتحه لمدة أطول.
+    """
+    __slots__ = ('name', 'semaphore', 'failures', 'open_until', 'probing')
+
+    def __init__(self, name):
+        self.name = name
+        self.semaphore = asyncio.Semaphore(FETCH_PER_HOST)
+        self.failures = 0
+        self.open_until = 0.0
+        self.probing = False
+
+    def allow(self, now):
+        if self.failures < BREAKER_THRESHOLD:
+            return True
+        if now < self.open_until or self.probing:
+            return False
+        self.probing = True  # طلب تجريبي واحد
+        return True
+
+    def record_success(self):
+        if self.failures >= BREAKER_THRESHOLD:
+            logging.info(f"🔌 {self.name}: عاد للعمل")
+        self.failures = 0
+        self.open_until = 0.0
+        self.probing = False
+
+    def record_failure(self, now):
+        self.failures += 1
+        self.probing = False
+        if self.failures >= BREAKER_THRESHOLD:
+            delay = min(BREAKER_MAX_DELAY, BREAKER_BASE_DELAY * 2 ** (self.failures - BREAKER_THRESHOLD))
+            delay *= random.uniform(0.5, 1.0)
+            self.open_until = now + delay
+            logging.warning(f"🔌 {self.name}: {self.failures} أخطاء متتالية، إيقاف {int(delay)} ثانية")
+
+host_states = {}  # الموقع -> HostState
+fetch_semaphore = asyncio.Semaphore(FETCH_CONCURRENCY)
+
+def get_host_state(url):
+    host = urlsplit(url).hostname or url
+    state = host_states.get(host)
+    if state is None:
+        state = host_states[host] = HostState(host)
+    return state
+
+Gauge('newsbot_open_circuits', 'Hosts currently skipped by the circuit breaker', (),
+      lambda: {(): sum(1 for h in host_states.values() if h.failures >= BREAKER_THRESHOLD)})
 
 # ========== وظائف RSS محسنة ==========
-async def fetch_rss_safe(session, url, source_name):
-    """جلب RSS بأمان مع headers مناسبة"""
+# الخبر tuple مسمى: أصغر من dict ويُنقل بين العمليات بدون تحويل
+# timestamp: وقت الجلب، published: وقت النشر (أو وقت الجلب إن لم يُعرف)
+Article = namedtuple('Article', ('id', 'title', 'link', 'time', 'summary', 'type', 'source', 'timestamp', 'published'))
+
+def make_article(article_id, title, link, time_text, summary, news_type, source_name):
+    """إنشاء خبر؛ التصنيف والمصدر يتكرران كثيراً فيُخزنان مرة واحدة (intern)"""
+    now = time.time()
+    published = parse_published(time_text)
+    # تواريخ المستقبل (توقيت خاطئ في المصدر) لا تتقدم على غيرها
+    published = min(published, now) if published is not None else now
+    return Article(article_id, title, link, time_text, summary,
+                   sys.intern(news_type), sys.intern(source_name), now, published)
+
+def _apply_feed_category(articles, entry):
+    """الأخبار التي لم تطابق أي كلمة مفتاحية تأخذ تصنيف المصدر (FeedEntry.category) إن وُجد"""
+    if entry is None or entry.category is None:
+        return articles
+    return [a._replace(type=entry.category) if a.type == "عام" else a for a in articles]
+
+async def fetch_rss_safe(session, url, source_name, entry=None):
+    """جلب RSS بأمان ضمن حدود التزامن العامة ولكل موقع، مع قاطع الدائرة
+
+    entry (FeedEntry) اختياري: يحدد نوع المحلل وعدد الأخبار.
+    """
+    state = get_feed_state(url)
+    host = get_host_state(url)
+    now = time.time()
+    if not host.allow(now):
+        FETCH_ERRORS.inc(source_name, 'circuit_open')
+        logging.info(f"🔌 تخطي {source_name}: {host.name} متوقف مؤقتاً")
+        state.next_due = max(state.next_due, host.open_until)
+        return state.articles
+    
+    probe = host.probing  # هذا هو الطلب التجريبي بعد فتح القاطع
+    try:
+        async with fetch_semaphore, host.semaphore:
+            return await _fetch_feed(session, url, source_name, state, host, entry)
+    finally:
+        if probe:
+            # إلغاء (نهاية الدورة أو الإيقاف) أو خطأ غير متوقع لم يُسجَّل نجاحاً ولا فشلاً:
+            # بدون هذا يبقى probing ويُتجاهل الموقع إلى الأبد
+            host.probing = False
+
+async def _fetch_feed(session, url, source_name, state, host, entry):
+    """جلب RSS بأمان مع headers مناسبة وطلب شرطي (ETag / Last-Modified)"""
     headers = {
         'User-Agent': 'Mozilla/5.0 (compatible; RSSBot/1.0)',
         'Accept': 'application/rss+xml, application/xml, text/xml, */*',
         'Accept-Encoding': 'gzip, deflate',  # لا نطلب brotli
     }
     
+    if state.etag:
+        headers['If-None-Match'] = state.etag
+    if state.last_modified:
+        headers['If-Modified-Since'] = state.last_modified
+    
+    changed = False
+    started = time.perf_counter()
     try:
-        async with session.get(url, headers=headers, timeout=15) as response:
+        async with session.get(url, headers=headers) as response:
+            FETCH_RESPONSES.inc(source_name, response.status)
+            if response.status >= 500 or response.status == 429:
+                host.record_failure(time.time())
+            else:
+                host.record_success()
+            if response.status == 304:
+                logging.info(f"💤 {source_name}: لم يتغير (304)")
+                return state.articles
+            
             if response.status == 200:
+                # المدققات تُحفظ بعد نجاح القراءة والتحليل فقط: جسم مقطوع أو timeout
+                # مع مدققات جديدة يجعل الطلب التالي 304 فتضيع أخبار هذه النسخة
+                etag = response.headers.get('ETag')
+                last_modified = response.headers.get('Last-Modified')
                 content_type = response.headers.get('Content-Type', '')
-                
-                # معالجة محتوى XML
-                if 'xml' in content_type or 'rss' in content_type or url.endswith('.xml') or url.endswith('.rss'):
-                    text = await response.text()
-                    return parse_rss_xml(text, source_name)
+                known = {a.id for a in state.articles}
+                parser = entry.parser if entry else 'auto'
+                limit = entry.item_limit if entry else RSS_ITEM_LIMIT
+                if parser == 'auto':
+                    is_xml = 'xml' in content_type or 'rss' in content_type or url.endswith('.xml') or url.endswith('.rss')
                 else:
-                    # محاولة كـ HTML
-                    text = await response.text()
-                    return parse_html_for_news(text, source_name)
+                    is_xml = parser != 'html'
+                
+                # معالجة محتوى XML: تحليل تدريجي يتوقف عند أول خبر معروف
+                if is_xml:
+                    new_articles = await parse_rss_stream(
+                        _count_bytes(response.content.iter_chunked(16384), source_name), source_name,
+                        limit=limit,
+                        is_known=lambda article_id: article_id in known or article_id in sent_articles
+                    )
+                    new_articles = _apply_feed_category([a for a in new_articles if a.id not in known], entry)
+                    signatures = await sign_offloaded(new_articles)
+                    state.etag, state.last_modified = etag, last_modified
+                    changed = bool(new_articles)
+                    state.set_articles((new_articles + state.articles)[:limit], signatures)
+                    return state.articles
+                
+                # محاولة كـ HTML
+                body = await response.read()
+                FETCH_BYTES.inc(source_name, amount=len(body))
+                
+                # نفس المحتوى؟ لا داعي لإعادة التحليل
+                content_hash = hashlib.md5(body).hexdigest()
+                if content_hash == state.content_hash:
+                    state.etag, state.last_modified = etag, last_modified
+                    logging.info(f"💤 {source_name}: المحتوى لم يتغير")
+                    return state.articles
+                
+                articles, signatures = await parse_offloaded(
+                    'html', body, response.charset, source_name, max(limit, 15),
+                    url=url, selectors=entry.selectors if entry else None
+                )
+                articles = _apply_feed_category(articles, entry)
+                changed = any(a.id not in known for a in articles)
+                state.etag, state.last_modified = etag, last_modified
+                state.content_hash = content_hash
+                state.set_articles(articles, signatures)
+                return articles
                     
     except aiohttp.client_exceptions.ClientError as e:
+        host.record_failure(time.time())
+        FETCH_ERRORS.inc(source_name, 'network')
         logging.error(f"❌ خطأ شبكة في {source_name}: {e}")
     except asyncio.TimeoutError:
+        host.record_failure(time.time())
+        FETCH_ERRORS.inc(source_name, 'timeout')
         logging.error(f"⏰ timeout في {source_name}")
     except Exception as e:
+        FETCH_ERRORS.inc(source_name, 'other')
         logging.error(f"❌ خطأ في {source_name}: {e}")
+    finally:
+        FETCH_SECONDS.observe(time.perf_counter() - started, source_name)
+        state.schedule(changed, time.time())
     
     return []
 
-def parse_rss_xml(xml_text, source_name):
-    """تحليل XML لـ RSS"""
+async def _count_bytes(chunks, source_name):
+    """تمرير الأجزاء كما هي مع عدّ حجمها"""
+    async for chunk in chunks:
+        FETCH_BYTES.inc(source_name, amount=len(chunk))
+        yield chunk
+
+def _local_tag(tag):
+    """اسم العنصر بدون namespace"""
+    return tag.rsplit('}', 1)[-1]
+
+def _first_field(fields, names):
+    """أول عنصر موجود من الأسماء بالترتيب"""
+    return next((fields[name] for name in names if name in fields), None)
+
+def rss_item_to_article(item, source_name):
+    """تحويل عنصر item/entry إلى خبر (RSS أو Atom)"""
+    # أول عنصر من كل اسم (بدون namespace)
+    fields = {}
+    for child in item:
+        fields.setdefault(_local_tag(child.tag), child)
+    
+    # استخراج العنوان
+    title_elem = fields.get('title')
+    if title_elem is None:
+        return None
+    
+    title = title_elem.text.strip() if title_elem.text else ""
+    if not title or len(title) < 10:
+        return None
+    
+    # استخراج الرابط
+    link_elem = fields.get('link')
+    link = ""
+    if link_elem is not None:
+        if link_elem.text and link_elem.text.strip():
+            link = link_elem.text.strip()
+        elif 'href' in link_elem.attrib:
+            link = link_elem.attrib['href']
+    
+    # استخراج الوقت (عنصر بلا أبناء قيمته False، لذلك لا نستخدم or)
+    date_elem = _first_field(fields, ('pubDate', 'published', 'updated', 'date'))
+    time_text = date_elem.text.strip() if date_elem is not None and date_elem.text else "قبل قليل"
+    
+    # استخراج الملخص
+    desc_elem = _first_field(fields, ('description', 'summary', 'content'))
+    summary = desc_elem.text.strip()[:150] if desc_elem is not None and desc_elem.text else ""
+    
+    return make_article(
+        hashlib.md5(f"{title[:40]}{source_name}".encode()).hexdigest()[:10],  # معرّف فريد
+        title, link, time_text, summary, categorize_news(title), source_name
+    )
+
+async def parse_rss_stream(chunks, source_name, limit=RSS_ITEM_LIMIT, is_known=None):
+    """تحليل RSS/Atom تدريجياً من أجزاء الاستجابة
+
+    يُخرج الخبر عند إغلاق كل item/entry ويتوقف عن القراءة عند بلوغ الحد
+    أو عند أول خبر معروف (المصادر مرتبة من الأحدث). عند XML تالف يكمل
+    القراءة ويعود إلى parse_rss_xml.
+    """
+    parser = ET.XMLPullParser(events=('end',))
     articles = []
+    consumed = []
+    parse_time = 0.0  # وقت التحليل فقط، بدون انتظار الشبكة
+    categorize_time = 0.0
+    done = False
     
     try:
-        # تنظيف النص أولاً
-        xml_text = re.sub(r'encoding="[^"]+"', 'encoding="utf-8"', xml_text)
-        xml_text = re.sub(r'&(?!(?:amp|lt|gt|quot|apos);)', '&amp;', xml_text)
-        
-        root = ET.fromstring(xml_text)
+        async for chunk in chunks:
+            consumed.append(chunk)
+            started = time.perf_counter()
+            parser.feed(chunk)
+            for _, elem in parser.read_events():
+                if _local_tag(elem.tag) not in ('item', 'entry'):
+                    continue
+                article = rss_item_to_article(elem, source_name)
+                elem.clear()
+                if article is None:
+                    continue
+                if is_known and is_known(article.id):
+                    done = True
+                    break
+                articles.append(article)
+                if len(articles) >= limit:
+                    done = True
+                    break
+            parse_time += time.perf_counter() - started
+            categorize_time += take_categorize_seconds()
+            if done:
+                break
+        else:
+            parser.close()
         
-        # البحث عن items في RSS
-        items = []
-        for elem in root.iter():
-            if 'item' in elem.tag:
-                items.append(elem)
+    except ET.ParseError as e:
+        logging.warning(f"⚠️ XML غير صالح في {source_name} ({e})، تحليل كامل...")
+        async for chunk in chunks:
+            consumed.append(chunk)
+        articles, _ = await parse_offloaded('rss_xml', b"".join(consumed), 'utf-8', source_name, limit)
+        return articles
+    
+    PARSE_SECONDS.observe(parse_time, 'rss_stream')
+    PARSED_ITEMS.inc('rss_stream', amount=len(articles))
+    CATEGORIZE_SECONDS.observe(categorize_time)
+    logging.info(f"✅ RSS {source_name}: {len(articles)} خبر جديد")
+    return articles
+
+def _xml_root(xml_data):
+    """تحليل XML من bytes مباشرة (المحلل يقرأ الترميز من الترويسة)
+
+    التنظيف بـ regex (وما يتطلبه من نسخ النص) فقط إذا فشل التحليل المباشر.
+    """
+    try:
+        return ET.fromstring(xml_data)
+    except ET.ParseError:
+        if isinstance(xml_data, bytes):
+            xml_data = xml_data.decode('utf-8', errors='replace')
+        xml_data = re.sub(r'encoding="[^"]+"', 'encoding="utf-8"', xml_data)
+        xml_data = re.sub(r'&(?!(?:amp|lt|gt|quot|apos);)', '&amp;', xml_data)
+        return ET.fromstring(xml_data)
+
+@timed_parser('rss_xml')
+def parse_rss_xml(xml_text, source_name, limit=RSS_ITEM_LIMIT):
+    """تحليل XML لـ RSS (نص أو bytes)؛ أول limit خبر"""
+    articles = []
+    
+    try:
+        root = _xml_root(xml_text)
         
-        if not items:
-            # محاولة بديلة
-            items = root.findall('.//item') or root.findall('.//entry')
+        # البحث عن items في RSS و entries في Atom (بدون namespace)
+        items = [elem for elem in root.iter() if _local_tag(elem.tag) in ('item', 'entry')]
         
-        for item in items[:12]:  # أول 12 فقط
+        for item in items[:limit]:
             try:
-                # استخراج العنوان
-                title_elem = item.find('title') or item.find('{http://www.w3.org/2005/Atom}title')
-                if title_elem is None:
-                    continue
-                    
-                title = title_elem.text.strip() if title_elem.text else ""
-                if not title or len(title) < 10:
-                    continue
-                
-                # استخراج الرابط
-                link_elem = item.find('link') or item.find('{http://www.w3.org/2005/Atom}link')
-                link = ""
-                if link_elem is not None:
-                    if link_elem.text:
-                        link = link_elem.text.strip()
-                    elif 'href' in link_elem.attrib:
-                        link = link_elem.attrib['href']
-                
-                # استخراج الوقت
-                date_elem = item.find('pubDate') or item.find('published') or item.find('date')
-                time_text = date_elem.text.strip() if date_elem is not None and date_elem.text else "قبل قليل"
-                
-                # استخراج الملخص
-                desc_elem = item.find('description') or item.find('summary') or item.find('content')
-                summary = desc_elem.text.strip()[:150] if desc_elem is not None and desc_elem.text else ""
-                
-                # تصنيف
-                news_type = categorize_news(title)
-                
-                # معرّف فريد
-                article_id = hashlib.md5(f"{title[:40]}{source_name}".encode()).hexdigest()[:10]
-                
-                articles.append({
-                    'id': article_id,
-                    'title': title,
-                    'link': link,
-                    'time': time_text,
-                    'summary': summary,
-                    'type': news_type,
-                    'source': source_name,
-                    'timestamp': time.time()
-                })
-                
+                article = rss_item_to_article(item, source_name)
+                if article:
+                    articles.append(article)
             except Exception as e:
                 continue
         
@@ -226,16 +1250,10 @@ def parse_rss_xml(xml_text, source_name):
                     if title:
                         title = title.text.strip()
                         if len(title) > 10:
-                            articles.append({
-                                'id': hashlib.md5(title.encode()).hexdigest()[:10],
-                                'title': title,
-                                'link': "",
-                                'time': "قبل قليل",
-                                'summary': "",
-                                'type': categorize_news(title),
-                                'source': source_name,
-                                'timestamp': time.time()
-                            })
+                            articles.append(make_article(
+                                hashlib.md5(title.encode()).hexdigest()[:10],
+                                title, "", "قبل قليل", "", categorize_news(title), source_name
+                            ))
                 except:
                     continue
             logging.info(f"✅ RSS (بديل) {source_name}: {len(articles)} خبر")
@@ -244,9 +1262,141 @@ def parse_rss_xml(xml_text, source_name):
     
     return articles
 
-def parse_html_for_news(html, source_name):
-    """تحليل HTML لأخبار (كبديل)"""
-    soup = BeautifulSoup(html, 'html.parser')
+HEADLINE_TAGS = frozenset(('h1', 'h2', 'h3', 'h4'))
+
+def _node_text(node):
+    """نص عنصر (بمسافات موحدة) أو قيمة خاصية"""
+    if isinstance(node, str):
+        return " ".join(node.split())
+    return " ".join("".join(node.itertext()).split())
+
+def _first_text(results):
+    for node in results:
+        text = _node_text(node)
+        if text:
+            return text
+    return ""
+
+def _first_link(results):
+    """رابط من نتائج محدد: قيمة خاصية (@href) أو href العنصر (محددات CSS و .//a)"""
+    for node in results:
+        link = node.strip() if isinstance(node, str) else node.get('href') or _headline_link(node)
+        if link:
+            return link
+    return ""
+
+def _first_time(results):
+    """وقت من نتائج محدد: قيمة خاصية أو datetime العنصر أو نصه"""
+    for node in results:
+        text = _node_text(node) if isinstance(node, str) else node.get('datetime') or _node_text(node)
+        if text:
+            return text
+    return ""
+
+def _time_text(container):
+    """وقت النشر من أول <time> (datetime أو نصه)"""
+    for node in container.iter('time'):
+        return node.get('datetime') or _node_text(node)
+    return ""
+
+def _headline_link(headline):
+    """رابط العنوان: <a> داخله أو <a> يحيط به"""
+    for node in headline.iter('a'):
+        if node.get('href'):
+            return node.get('href')
+    node = headline.getparent()
+    while node is not None:
+        if node.tag == 'a' and node.get('href'):
+            return node.get('href')
+        node = node.getparent()
+    return ""
+
+def _html_article(title, link, time_text, source_name, base_url, news_type=None):
+    return make_article(
+        hashlib.md5(title.encode()).hexdigest()[:10],
+        title, urljoin(base_url, link) if base_url and link else link,
+        time_text or "حديث", "", news_type or categorize_news(title), source_name
+    )
+
+def _parse_html_walk(body, encoding, source_name, limit, base_url):
+    """مرور واحد على الصفحة بـ lxml يتوقف بعد limit عنوان مرشح
+
+    العنوان يُستكمل عند إغلاق العنصر الأب، لأن <time> ورابط "المزيد" يأتيان
+    غالباً بعد العنوان داخل نفس الحاوية.
+    """
+    parser = lxml_etree.HTMLPullParser(events=('end',), encoding=encoding)
+    articles = []
+    pending = {}  # العنصر الأب -> [(العنوان, الرابط, التصنيف)]
+    candidates = 0
+    
+    def complete(parent):
+        # عنوان مباشرة داخل body ليس له حاوية خاصة به
+        is_container = parent.tag not in ('body', 'html')
+        time_text = _time_text(parent) if is_container else ""
+        container_link = None
+        for title, link, news_type in pending.pop(parent):
+            if not link and is_container:
+                if container_link is None:
+                    container_link = next((a.get('href') for a in parent.iter('a') if a.get('href')), "")
+                link = container_link
+            articles.append(_html_article(title, link, time_text, source_name, base_url, news_type))
+    
+    def read_events():
+        """True عند بلوغ الحد"""
+        nonlocal candidates
+        for _, elem in parser.read_events():
+            if elem in pending:
+                complete(elem)
+            if elem.tag not in HEADLINE_TAGS:
+                continue
+            title = _node_text(elem)
+            if not 20 < len(title) < 200:
+                continue
+            candidates += 1
+            news_type = categorize_news(title)
+            if news_type != "عام":  # فقط المهمة
+                pending.setdefault(elem.getparent(), []).append((title, _headline_link(elem), news_type))
+            if candidates >= limit:
+                return True
+        return False
+    
+    for offset in range(0, len(body), 16384):
+        parser.feed(body[offset:offset + 16384])
+        if read_events():
+            break
+    else:
+        parser.close()
+        read_events()
+    # ما بقي (توقف مبكر): الوقت والرابط مما وصل من الحاوية
+    for parent in list(pending):
+        complete(parent)
+    return articles
+
+def _parse_html_selectors(body, encoding, source_name, limit, base_url, selectors):
+    """استخراج بمحددات الموقع (من ملف المصادر): كل item خبر"""
+    root = lxml_etree.fromstring(body, lxml_etree.HTMLParser(encoding=encoding))
+    if root is None:
+        return []
+    title_selector = compile_selector(selectors.get('title', './/h1|.//h2|.//h3|.//h4'))
+    link_selector = compile_selector(selectors.get('link', './/a/@href'))
+    time_selector = compile_selector(selectors['time']) if selectors.get('time') else None
+    articles = []
+    for item in compile_selector(selectors['item'])(root):
+        title = _first_text(title_selector(item))
+        if len(title) < 10:
+            continue
+        time_text = _first_time(time_selector(item)) if time_selector else _time_text(item)
+        articles.append(_html_article(title, _first_link(link_selector(item)), time_text, source_name, base_url))
+        if len(articles) >= limit:
+            break
+    return articles
+
+def _parse_html_soup(html, source_name, limit=15, encoding=None):
+    """التحليل القديم بـ BeautifulSoup (عند عدم توفر lxml)"""
+    if isinstance(html, bytes):
+        soup = BeautifulSoup(html, 'html.parser', from_encoding=encoding)
+    else:
+        soup = BeautifulSoup(html, 'html.parser')
     articles = []
     
     # البحث عن عناوين
@@ -254,90 +1404,1042 @@ def parse_html_for_news(html, source_name):
     for tag in ['h1', 'h2', 'h3', 'h4']:
         headlines.extend(soup.find_all(tag))
     
-    for headline in headlines[:15]:
+    for headline in headlines[:limit]:
         title = headline.get_text(strip=True)
         if len(title) > 20 and len(title) < 200:
             news_type = categorize_news(title)
             if news_type != "عام":  # فقط المهمة
-                articles.append({
-                    'id': hashlib.md5(title.encode()).hexdigest()[:10],
-                    'title': title,
-                    'link': "",
-                    'time': "حديث",
-                    'summary': "",
-                    'type': news_type,
-                    'source': source_name,
-                    'timestamp': time.time()
-                })
+                articles.append(make_article(
+                    hashlib.md5(title.encode()).hexdigest()[:10],
+                    title, "", "حديث", "", news_type, source_name
+                ))
     
     return articles
 
-def categorize_news(title):
-    """تصنيف الخبر"""
-    title_lower = title.lower()
-    for category, keywords in KEYWORDS.items():
-        for keyword in keywords:
-            if keyword.lower() in title_lower:
-                return category
-    return "عام"
+@timed_parser('html')
+def parse_html_for_news(html, source_name, limit=15, encoding=None, url=None, selectors=None):
+    """تحليل HTML لأخبار (كبديل)؛ html نص أو bytes بترميز encoding
 
-# ========== إرسال إلى تليجرام ==========
-async def send_news_to_channel(bot, article):
-    """إرسال خبر إلى القناة"""
+    بمحددات الموقع إن وُجدت، وإلا أول limit عنوان (h1-h4) بترتيب الصفحة
+    مع روابطها وأوقاتها.
+    """
+    if lxml_etree is None:
+        return _parse_html_soup(html, source_name, limit, encoding)
+    if isinstance(html, str):
+        html, encoding = html.encode('utf-8'), 'utf-8'
+    if not html.strip():
+        return []
+    if selectors:
+        return _parse_html_selectors(html, encoding, source_name, limit, url, selectors)
+    return _parse_html_walk(html, encoding, source_name, limit, url)
+
+# بادئات عربية شائعة تسبق الكلمة (الـ التعريف وحروف العطف والجر)
+ARABIC_PREFIXES = ('وال', 'بال', 'فال', 'كال', 'لل', 'ال', 'و', 'ب', 'ل', 'ف')
+
+def _is_arabic(word):
+    return any('\u0600' <= ch <= '\u06ff' for ch in word)
+
+# كل ما ليس حرفاً أو رقماً (Unicode) يفصل الكلمات، حتى داخل الكلمة:
+# Fed's -> fed s، Oil-price -> oil price، Gold/silver -> gold silver
+_NON_WORD_RE = re.compile(r"[^\w\s]")
+
+def _tokenize(text):
+    """تقطيع سريع في C: استبدال الترقيم بمسافة ثم split"""
+    return _NON_WORD_RE.sub(" ", text.lower()).split()
+
+class KeywordMatcher:
+    """مطابق كلمات مُجمّع مرة واحدة من KEYWORDS
+
+    يقطّع العنوان إلى كلمات في مرور واحد ثم يبحث عن كل كلمة في قاموس
+    يضم مسبقاً صيغ الكلمة (البادئات العربية وجمع الإنجليزية)، فالتكلفة لا
+    تعتمد على عدد الكلمات المفتاحية والمطابقة تحترم حدود الكلمات
+    (ban لا تطابق bank، و fed لا تطابق federal).
+    """
+
+    def __init__(self, keywords):
+        self._order = {category: i for i, category in enumerate(keywords)}
+        self._words = {}  # صيغة الكلمة -> الكلمة المفتاحية
+        self._phrases = {}  # أول كلمة في العبارة -> [(عدد الكلمات, العبارة)]
+        self._lookup = {}  # كلمة أو عبارة مفتاحية -> التصنيفات
+        self._results = {}  # مجموعة الصيغ المطابقة (بدون عبارات) -> النتيجة
+        for category, words in keywords.items():
+            for word in words:
+                tokens = _tokenize(word)
+                if not tokens:
+                    continue
+                key = " ".join(tokens)
+                if category not in self._lookup.setdefault(key, []):
+                    self._lookup[key].append(category)
+                if len(tokens) == 1:
+                    for form in self._forms(key):
+                        self._words.setdefault(form, key)
+                else:
+                    self._phrases.setdefault(tokens[0], []).append((len(tokens), tokens[1:], key))
+        # صيغ الكلمات وأوائل العبارات: تقاطع واحد مع كلمات العنوان
+        self._index = frozenset(self._words.keys() | self._phrases.keys())
+
+    def _rank(self, item):
+        return -item[1], self._order[item[0]]
+
+    @staticmethod
+    def _forms(word):
+        """صيغ الكلمة: "نفط" -> "النفط" و"والنفط"... و war -> wars"""
+        if _is_arabic(word):
+            return [word] + [prefix + word for prefix in ARABIC_PREFIXES]
+        return [word, word + 's', word + 'es']
+
+    def scores(self, title):
+        """التصنيفات مع عدد الكلمات المفتاحية المطابقة، الأعلى أولاً (tuple)"""
+        tokens = _NON_WORD_RE.sub(" ", title.lower()).split()
+        # تقاطع مجموعات (في C) بدل المرور على كل كلمة مفتاحية
+        hits = self._index.intersection(tokens)
+        if not hits:
+            return ()
+        # نفس الكلمات المطابقة تتكرر في عناوين كثيرة: النتيجة تُحسب مرة
+        result = self._results.get(hits)
+        if result is None:
+            result = self._score(hits, tokens)
+            if self._phrases.keys().isdisjoint(hits):  # العبارات تعتمد على ترتيب الكلمات
+                if len(self._results) >= 4096:
+                    self._results.clear()
+                self._results[hits] = result
+        return result
+
+    def _score(self, hits, tokens):
+        keys = {self._words[form] for form in hits if form in self._words}
+        for head in hits:
+            if head not in self._phrases:
+                continue
+            for i, token in enumerate(tokens):
+                if token != head:
+                    continue
+                for length, rest, key in self._phrases[head]:
+                    tail = tokens[i + 1:i + length]
+                    if len(tail) == len(rest) and all(
+                        t == r or t in (r + 's', r + 'es') for t, r in zip(tail, rest)
+                    ):
+                        keys.add(key)
+        counts = {}
+        for key in keys:
+            for category in self._lookup[key]:
+                counts[category] = counts.get(category, 0) + 1
+        return tuple(sorted(counts.items(), key=self._rank))
+
+keyword_matcher = KeywordMatcher(KEYWORDS)
+_keywords_mtime = None
+
+def reload_keywords_if_changed():
+    """إعادة تحميل KEYWORDS_FILE عند تعديله بدون إعادة التشغيل"""
+    global KEYWORDS, keyword_matcher, _keywords_mtime
+    if not KEYWORDS_FILE:
+        return
     try:
-        # إيموجيات حسب النوع
-        emoji_map = {
-            'فائدة': '🏦', 'تضخم': '📈', 'بطالة': '👥',
-            'ناتج': '📊', 'نفط': '🛢️', 'ذهب': '💰',
-            'حرب': '⚔️', 'عقوبات': '🚫'
+        mtime = os.path.getmtime(KEYWORDS_FILE)
+        if mtime == _keywords_mtime:
+            return
+        with open(KEYWORDS_FILE, encoding='utf-8') as f:
+            keywords = json.load(f)
+        keyword_matcher = KeywordMatcher(keywords)
+        KEYWORDS = keywords
+        _keywords_mtime = mtime
+        reset_parse_executor()
+        logging.info(f"🔑 تم تحميل الكلمات المفتاحية: {len(keywords)} تصنيف")
+    except Exception as e:
+        logging.error(f"❌ خطأ في تحميل {KEYWORDS_FILE}: {e}")
+
+def categorize_news_scored(title):
+    """كل التصنيفات المطابقة مع درجاتها"""
+    return keyword_matcher.scores(title)
+
+class _CategorizeClock(threading.local):
+    seconds = 0.0  # زمن التصنيف المتراكم في هذا الخيط
+
+_categorize_clock = _CategorizeClock()
+
+def categorize_news(title):
+    """تصنيف الخبر (التصنيف الأعلى درجة)
+
+    الزمن يُجمع فقط؛ المحلل يسجله في CATEGORIZE_SECONDS مرة لكل مصدر
+    (مدير سياق أو observe لكل عنوان يضيف أكثر من نصف تكلفة التصنيف).
+    """
+    started = time.perf_counter()
+    scores = keyword_matcher.scores(title)
+    _categorize_clock.seconds += time.perf_counter() - started
+    return scores[0][0] if scores else "عام"
+
+def take_categorize_seconds():
+    """زمن التصنيف المتراكم في هذا الخيط منذ آخر استدعاء"""
+    elapsed = _categorize_clock.seconds
+    _categorize_clock.seconds = 0.0
+    return elapsed
+
+# ========== تحليل خارج حلقة asyncio ==========
+def _parse_job(kind, body, encoding, source_name, limit, url=None, selectors=None):
+    """يُنفذ في عملية/خيط التحليل: bytes -> (زمن التحليل, زمن التصنيف, أخبار Article, توقيعاتها)"""
+    take_categorize_seconds()
+    started = time.perf_counter()
+    if kind == 'html':
+        articles = parse_html_for_news(body, source_name, limit=limit, encoding=encoding, url=url, selectors=selectors)
+    else:
+        articles = parse_rss_xml(body, source_name, limit=limit)
+    elapsed = time.perf_counter() - started
+    return elapsed, take_categorize_seconds(), articles, _sign_job(articles)
+
+def _sign_job(articles):
+    """يُنفذ في عملية/خيط التحليل: توقيعات MinHash (id -> توقيع) بدل حسابها على الحلقة"""
+    return {article.id: minhash_signature(article) for article in articles}
+
+_parse_executor = None
+_parse_slots = asyncio.Semaphore(PARSE_QUEUE_LIMIT)  # حد الطابور: الجالبون ينتظرون عند امتلائه
+
+def get_parse_executor():
+    global _parse_executor
+    if _parse_executor is None:
+        if PARSE_MODE == 'process':
+            _parse_executor = ProcessPoolExecutor(max_workers=PARSE_WORKERS)
+        else:
+            _parse_executor = ThreadPoolExecutor(max_workers=PARSE_WORKERS, thread_name_prefix='parse')
+    return _parse_executor
+
+def reset_parse_executor():
+    """العمليات تحمل نسخة قديمة من KEYWORDS، فتُستبدل بعد إعادة تحميلها"""
+    global _parse_executor
+    if _parse_executor is not None:
+        _parse_executor.shutdown(wait=False)
+        _parse_executor = None
+
+async def parse_offloaded(kind, body, encoding, source_name, limit, url=None, selectors=None):
+    """تحليل body (html أو rss_xml) في مجمع العمليات حسب PARSE_MODE: (أخبار, توقيعات)"""
+    if PARSE_MODE == 'inline':
+        _, categorized, articles, signatures = _parse_job(kind, body, encoding, source_name, limit, url, selectors)
+    else:
+        async with _parse_slots:
+            loop = asyncio.get_running_loop()
+            elapsed, categorized, articles, signatures = await loop.run_in_executor(
+                get_parse_executor(), _parse_job, kind, body, encoding, source_name, limit, url, selectors
+            )
+        if PARSE_MODE == 'process':
+            # مقاييس العملية الفرعية لا تصل إلى هنا
+            PARSE_SECONDS.observe(elapsed, kind)
+            PARSED_ITEMS.inc(kind, amount=len(articles))
+        # intern لا ينتقل مع pickle
+        articles = [article._replace(type=sys.intern(article.type), source=sys.intern(article.source))
+                    for article in articles]
+    CATEGORIZE_SECONDS.observe(categorized)
+    return articles, signatures
+
+async def sign_offloaded(articles):
+    """توقيعات أخبار حُللت على الحلقة (التحليل التدريجي، FeedCache) في مجمع التحليل"""
+    if not articles:
+        return {}
+    if PARSE_MODE == 'inline':
+        return _sign_job(articles)
+    async with _parse_slots:
+        return await asyncio.get_running_loop().run_in_executor(get_parse_executor(), _sign_job, articles)
+
+async def loop_lag_probe(interval=0.1):
+    """قياس تأخر حلقة asyncio: كم تأخر استيقاظ sleep عن موعده"""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        LOOP_LAG_SECONDS.observe(max(0.0, loop.time() - started - interval))
+
+# ========== إزالة الأخبار المتشابهة ==========
+_MINHASH_PRIME = (1 << 61) - 1
+_MINHASH_RNG = random.Random(1)  # بذرة ثابتة: نفس التوقيع في كل تشغيل
+_MINHASH_PERMS = [
+    (_MINHASH_RNG.randrange(1, _MINHASH_PRIME), _MINHASH_RNG.randrange(0, _MINHASH_PRIME))
+    for _ in range(64)  # تقدير أدق قرب العتبة من 32
+]
+
+def minhash_signature(article):
+    """توقيع MinHash من كلمات العنوان والملخص وأزواجها (None للنص القصير جداً)"""
+    tokens = [t for t in _tokenize(f"{article.title} {article.summary}") if t]
+    shingles = set(tokens) | {f"{a} {b}" for a, b in zip(tokens, tokens[1:])}
+    if len(shingles) < NEAR_DUP_MIN_SHINGLES:
+        return None
+    hashes = [zlib.crc32(s.encode()) for s in shingles]
+    return tuple(
+        min((a * h + b) % _MINHASH_PRIME for h in hashes)
+        for a, b in _MINHASH_PERMS
+    )
+
+class NearDuplicateIndex:
+    """فهرس LSH لتوقيعات MinHash ضمن نافذة زمنية متحركة
+
+    التوقيع يُقسم إلى bands، وأي خبرين يتشاركان band كاملاً مرشحان للتشابه
+    ثم يُتحقق من التشابه المقدّر (نسبة القيم المتطابقة) مقابل threshold.
+    البحث لا يمر على كل الأخبار المخزنة.
+    """
+
+    def __init__(self, threshold=NEAR_DUP_THRESHOLD, window=NEAR_DUP_WINDOW, bands=16, max_size=5000):
+        self.threshold = threshold
+        self.window = window
+        self.bands = bands
+        self.max_size = max_size
+        self._entries = deque()  # (الوقت, المعرف, التوقيع) من الأقدم
+        self._buckets = {}  # (رقم band, القيم) -> معرفات
+
+    def _band_keys(self, signature):
+        rows = len(signature) // self.bands
+        return [(i, signature[i * rows:(i + 1) * rows]) for i in range(self.bands)]
+
+    def find(self, signature):
+        """معرف أول خبر مشابه في الفهرس أو None"""
+        if signature is None:
+            return None
+        self._evict()
+        candidates = set()
+        for key in self._band_keys(signature):
+            candidates.update(self._buckets.get(key, ()))
+        for entry_id, entry_signature in candidates:
+            same = sum(map(operator.eq, signature, entry_signature))
+            if same / len(signature) >= self.threshold:
+                return entry_id
+        return None
+
+    def add(self, article_id, signature):
+        if signature is None:
+            return
+        entry = (article_id, signature)
+        self._entries.append((time.time(), entry))
+        for key in self._band_keys(signature):
+            self._buckets.setdefault(key, set()).add(entry)
+        self._evict()
+
+    def _evict(self):
+        cutoff = time.time() - self.window
+        while self._entries and (self._entries[0][0] < cutoff or len(self._entries) > self.max_size):
+            _, entry = self._entries.popleft()
+            for key in self._band_keys(entry[1]):
+                bucket = self._buckets.get(key)
+                if bucket is not None:
+                    bucket.discard(entry)
+                    if not bucket:
+                        del self._buckets[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+def _representative_rank(article):
+    """الأفضل لتمثيل مجموعة متشابهة: مصنّف، له رابط، ملخص أطول"""
+    return (article.type != "عام", bool(article.link), len(article.summary))
+
+def drop_near_duplicates(articles, signatures=None, sources=None, index=None, corroborated=None):
+    """إبقاء أفضل خبر من كل مجموعة متشابهة
+
+    التوقيعات المحسوبة تُحفظ في signatures (id -> توقيع) لاستخدامها لاحقاً
+    عند مقارنة الخبر بما أُرسل مؤخراً في كل قناة، ومصادر كل مجموعة في
+    sources (id الخبر المُبقى -> أسماء المصادر) لحساب تأكيد الخبر.
+    الموجود مسبقاً في signatures لا يُعاد حسابه، و index يسمح بالمقارنة مع
+    دفعات سابقة من نفس الدورة؛ معرفات أخبارها التي أكدتها هذه الدفعة تُضاف
+    إلى corroborated إن أُعطي.
+    """
+    if signatures is None:
+        signatures = {}
+    if sources is None:
+        sources = {}
+    batch = index if index is not None else NearDuplicateIndex(window=float('inf'), max_size=len(articles) + 1)
+    kept = []
+    for article in sorted(articles, key=_representative_rank, reverse=True):
+        if article.id in signatures:
+            signature = signatures[article.id]
+        else:
+            signature = signatures[article.id] = minhash_signature(article)
+        match = batch.find(signature)
+        if match:
+            sources[match].add(article.source)
+            if corroborated is not None:
+                corroborated.add(match)
+            continue
+        batch.add(article.id, signature)
+        sources[article.id] = {article.source}
+        kept.append(article)
+    NEAR_DUPLICATES.inc(amount=len(articles) - len(kept))
+    return kept
+
+# ========== ترتيب الأخبار ==========
+def _parse_rfc822(text):
+    return parsedate_to_datetime(text)  # RSS: Mon, 06 Jan 2025 10:00:00 GMT
+
+def _parse_iso8601(text):
+    return datetime.fromisoformat(text)  # Atom: 2025-01-06T10:00:00Z
+
+_DATE_PARSERS = (_parse_rfc822, _parse_iso8601)
+
+@functools.lru_cache(maxsize=4096)
+def parse_published(text):
+    """وقت النشر (epoch) من نص pubDate/published، أو None
+
+    القائمة ثابتة (تُستدعى من خيوط التحليل معاً)؛ النص المتكرر من lru_cache.
+    """
+    text = text.strip()
+    for parser in _DATE_PARSERS:
+        try:
+            value = parser(text)
+        except (TypeError, ValueError, IndexError, OverflowError):
+            continue
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    return None
+
+def score_article(article, corroboration=1, now=None):
+    """درجة الخبر: وزن التصنيف × سمعة المصدر × التأكيد × التناقص مع العمر
+
+    تُحسب كلوغاريتم حتى لا تصبح درجات الأخبار القديمة كلها صفراً (الترتيب نفسه).
+    """
+    now = time.time() if now is None else now
+    weight = CATEGORY_WEIGHTS.get(article.type, 1.0) * feed_registry.source_weight(article.source)
+    if weight <= 0:
+        return float('-inf')  # وزن 0 يعطل التصنيف/المصدر
+    weight *= 1 + RANK_CORROBORATION_BONUS * (min(corroboration, 5) - 1)
+    age = max(0.0, now - article.published)
+    return math.log(weight) - math.log(2) * age / RANK_HALF_LIFE
+
+def rank_articles(articles, sources=None):
+    """درجات الأخبار (id -> درجة) مرة واحدة لكل دورة"""
+    sources = sources or {}
+    now = time.time()
+    with RANK_SECONDS.time():
+        return {
+            article.id: score_article(article, len(sources.get(article.id, ())) or 1, now)
+            for article in articles
         }
+
+class TopK:
+    """أعلى k عناصر حسب الدرجة بـ heap محدود: O(n log k) بدل ترتيب كامل"""
+
+    def __init__(self, k):
+        self.k = k
+        self._heap = []  # (الدرجة, -الترتيب, العنصر): عند التعادل الأسبق أولاً
+        self._count = 0
+
+    def push(self, score, item):
+        if self.k <= 0:
+            return
+        entry = (score, -self._count, item)
+        self._count += 1
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        elif entry[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, entry)
+
+    def items(self):
+        """العناصر من الأعلى درجة"""
+        return [entry[2] for entry in sorted(self._heap, key=lambda entry: entry[:2], reverse=True)]
+
+    def __len__(self):
+        return len(self._heap)
+
+# ========== إرسال إلى تليجرام ==========
+_shared_bot = None
+_http_session = None
+
+def get_http_session():
+    """جلسة aiohttp واحدة مشتركة لكل عمليات الجلب
+
+    اتصالات keep-alive مع cache لـ DNS، والمهلة تبدأ بعد الحصول على مكان
+    في fetch_semaphore وليس أثناء الانتظار.
+    """
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=FETCH_CONCURRENCY,
+            limit_per_host=FETCH_PER_HOST,
+            ttl_dns_cache=600,
+            keepalive_timeout=60,
+            enable_cleanup_closed=True,
+        )
+        _http_session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=FETCH_TIMEOUT, sock_connect=5),
+        )
+    return _http_session
+
+def get_bot():
+    """Bot واحد مشترك بمجموعة اتصالات HTTP واحدة"""
+    global _shared_bot
+    if _shared_bot is None:
+        _shared_bot = Bot(
+            token=TELEGRAM_BOT_TOKEN,
+            base_url=f"{TELEGRAM_API_URL}/bot",
+            request=HTTPXRequest(connection_pool_size=8),
+        )
+    return _shared_bot
+
+EMOJI_MAP = {
+    'فائدة': '🏦', 'تضخم': '📈', 'بطالة': '👥',
+    'ناتج': '📊', 'نفط': '🛢️', 'ذهب': '💰',
+    'حرب': '⚔️', 'عقوبات': '🚫'
+}
+
+# محارف MarkdownV2 التي يجب تهريبها في النص العادي (حسب توثيق Bot API)
+_MARKDOWN_V2_ESCAPES = str.maketrans({ch: '\\' + ch for ch in '_*[]()~`>#+-=|{}.!\\'})
+_MARKDOWN_V2_URL_ESCAPES = str.maketrans({')': '\\)', '\\': '\\\\'})
+
+class MessageFormat:
+    """قوالب الرسائل بصيغة تليجرام واحدة مع التهريب الصحيح
+
+    رأس كل تصنيف (الرمز + التصنيف بخط عريض) يُبنى مرة واحدة. نص القالب
+    الثابت يُهرّب أيضاً (| محجوز في MarkdownV2). القص يتم على النص الأصلي
+    قبل التهريب حتى لا ينقطع وسم أو رمز تهريب.
+    """
+
+    def __init__(self, name, parse_mode, escape, bold, link):
+        self.name = name
+        self.parse_mode = parse_mode
+        self.escape = escape
+        self._bold = bold
+        self._link = link
+        self._headers = {}  # التصنيف -> رأس الرسالة
+        self._separator = escape(" | ")
+
+    def header(self, category):
+        header = self._headers.get(category)
+        if header is None:
+            emoji = EMOJI_MAP.get(category, '📰')
+            header = self._headers[category] = f"{emoji} {self._bold(self.escape(category.upper()))}{self._separator}"
+        return header
+
+    def read_more(self, link):
+        return f"\n🔗 {self._link(link, self.escape('اقرأ المزيد'))}" if link else ""
+
+    def news(self, article, title=None, summary=None):
+        """رسالة خبر واحد"""
+        escape = self.escape
+        title = article.title if title is None else title
+        summary = article.summary if summary is None else summary
+        text = f"{self.header(article.type)}{escape(article.source)}\n\n{escape(title)}\n\n"
+        if summary:
+            text += f"{escape(summary)}\n\n"
+        return f"{text}⏰ {escape(article.time)}{self.read_more(article.link)}"
+
+    def digest_line(self, article):
+        """سطر خبر داخل رسالة الملخص"""
+        emoji = EMOJI_MAP.get(article.type, '📰')
+        return (f"{emoji} {self.escape(article.title)}{self._separator}{self.escape(article.source)}"
+                f"{self.read_more(article.link)}")
+
+    def fit_news(self, article, limit=MESSAGE_LIMIT):
+        """رسالة خبر لا تتجاوز limit: يُقص الملخص ثم العنوان (النص الأصلي)"""
+        text = self.news(article)
+        title, summary = article.title, article.summary
+        while len(text) > limit and (summary or len(title) > 1):
+            excess = len(text) - limit + 1
+            if summary:
+                summary = summary[:max(0, len(summary) - excess)].rstrip()
+                summary = summary + "…" if summary else ""
+            else:
+                title = title[:max(1, len(title) - excess)].rstrip() + "…"
+            text = self.news(article, title, summary)
+        return text
+
+    def pack_digest(self, articles, limit=MESSAGE_LIMIT):
+        """أكبر عدد من الأخبار (بالترتيب) في رسالة واحدة: (النص, عدد الأخبار)"""
+        lines = []
+        size = 0
+        for article in articles:
+            line = self.digest_line(article)
+            if lines and size + len(line) + 2 > limit:
+                break
+            lines.append(line)
+            size += len(line) + (2 if size else 0)
+        return "\n\n".join(lines), len(lines)
+
+MESSAGE_FORMATS = {
+    'html': MessageFormat(
+        'html', 'HTML', lambda text: html.escape(text, quote=False),
+        lambda text: f"<b>{text}</b>",
+        lambda url, text: f'<a href="{html.escape(url, quote=True)}">{text}</a>',
+    ),
+    'markdownv2': MessageFormat(
+        'markdownv2', 'MarkdownV2', lambda text: text.translate(_MARKDOWN_V2_ESCAPES),
+        lambda text: f"*{text}*",
+        lambda url, text: f"[{text}]({url.translate(_MARKDOWN_V2_URL_ESCAPES)})",
+    ),
+    'plain': MessageFormat(
+        'plain', None, lambda text: text,
+        lambda text: text,
+        lambda url, text: url,
+    ),
+}
+message_format = MESSAGE_FORMATS.get(MESSAGE_FORMAT.lower(), MESSAGE_FORMATS['html'])
+
+def format_news_message(article, fmt=None):
+    """نص رسالة خبر واحد"""
+    return (fmt or message_format).fit_news(article)
+
+def format_digest_line(article, fmt=None):
+    """سطر خبر داخل رسالة الملخص"""
+    return (fmt or message_format).digest_line(article)
+
+class TokenBucket:
+    """محدد معدل: rate رمز في الثانية وسعة capacity"""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds):
+        """إيقاف الإرسال (flood wait من تليجرام)"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0
+
+class WindowQuota:
+    """حصة limit خبر خلال آخر window ثانية (نافذة منزلقة)
+
+    الدورات تتكرر بعدد مواعيد المصادر المختلفة، فالحصة لكل دورة تجعل عدد
+    المنشور يكبر مع عدد المصادر؛ هنا الحد ثابت في الزمن مهما تعددت الدورات.
+    """
+
+    def __init__(self, limit, window):
+        self.limit = limit
+        self.window = window
+        self._taken = deque()
+
+    def remaining(self):
+        cutoff = time.monotonic() - self.window
+        while self._taken and self._taken[0] <= cutoff:
+            self._taken.popleft()
+        return max(0, self.limit - len(self._taken))
+
+    def take(self, count):
+        now = time.monotonic()
+        self._taken.extend([now] * count)
+
+    def release(self, count):
+        """إرجاع آخر count مما أُخذ (خبر سُحب من الطابور قبل إرساله)"""
+        for _ in range(min(count, len(self._taken))):
+            self._taken.pop()
+
+# محدد البوت كله (مشترك بين كل القنوات)
+global_send_limiter = TokenBucket(TELEGRAM_GLOBAL_RATE, capacity=TELEGRAM_GLOBAL_RATE)
+
+PRIORITY_SYSTEM = 0     # رسائل الاختبار والحالة
+PRIORITY_IMPORTANT = 1  # أخبار مصنّفة
+PRIORITY_GENERAL = 2    # أخبار عامة
+
+class SendJob:
+    __slots__ = ('text', 'articles', 'future', 'arrived', 'signature')
+
+    def __init__(self, text, articles, future, arrived=None, signature=None):
+        self.text = text
+        self.articles = articles
+        self.future = future
+        # وصول الخبر في هذه الدورة (لا وقت تحليله: المخزّن من 304/FeedCache قديم)
+        self.arrived = time.time() if arrived is None else arrived
+        self.signature = signature  # توقيع الخبر من التصفية، يُضاف إلى recent بعد الإرسال
+
+class TelegramSendQueue:
+    """طابور إرسال لقناة واحدة: أولوية + محدد معدل + إعادة المحاولة
+
+    الأخبار المصنّفة تُرسل قبل العامة، والسرعة محدودة فقط بحدود تليجرام
+    (محدد القناة + المحدد العام) بدل انتظار ثابت. RetryAfter يوقف القناة
+    المدة المطلوبة ثم يعيد المحاولة. مع digest تُدمج الأخبار العامة
+    المنتظرة في رسالة واحدة.
+    
+    categories/sources تحدد الأخبار التي تُوجّه لهذه القناة (فارغة = الكل).
+    لكل قناة سجل إرسال خاص بها حتى يصل نفس الخبر لأكثر من قناة.
+    """
+
+    def __init__(self, chat_id, per_minute=TELEGRAM_CHAT_RATE, digest=SEND_DIGEST,
+                 categories=(), sources=()):
+        self.chat_id = chat_id
+        self.digest = digest
+        self.categories = frozenset(categories)
+        self.sources = frozenset(sources)
+        # القناة الأساسية تحتفظ بالمعرفات القديمة كما هي في sent_articles
+        self.key_prefix = "" if chat_id == CHANNEL_USERNAME else f"{chat_id}:"
+        self.recent = NearDuplicateIndex()
+        self.limiter = TokenBucket(per_minute / 60, capacity=3)
+        # حصص الترتيب لكل قناة خلال RANK_WINDOW (لا لكل دورة)
+        self.important_quota = WindowQuota(RANK_TOP_K, RANK_WINDOW)
+        self.general_quota = WindowQuota(RANK_GENERAL_K, RANK_WINDOW)
+        self._queue = asyncio.PriorityQueue()
+        self._waiting = {}  # id الخبر -> job لم يبدأ إرساله بعد (يمكن سحبه)
+        self._seq = 0
+        self._worker = None
+
+    def start(self):
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    def qsize(self):
+        return self._queue.qsize()
+
+    def accepts(self, article):
+        """هل يُوجّه الخبر لهذه القناة؟ (أي تصنيف مطابق، لا الأعلى فقط)"""
+        if self.sources and article.source not in self.sources:
+            return False
+        if not self.categories:
+            return True
+        if article.type in self.categories:
+            return True
+        return any(category in self.categories for category, _ in categorize_news_scored(article.title))
+
+    def already_sent(self, article, signature=None):
+        """أُرسل لهذه القناة، أو أُرسل خبر مشابه له مؤخراً"""
+        if self.key_prefix + article.id in sent_articles:
+            DEDUP_CHECKS.inc(self.chat_id, 'sent')
+            return True
+        if self.recent.find(signature) is not None:
+            DEDUP_CHECKS.inc(self.chat_id, 'similar')
+            return True
+        DEDUP_CHECKS.inc(self.chat_id, 'new')
+        return False
+
+    def _put(self, priority, job):
+        self._seq += 1
+        self._queue.put_nowait((priority, self._seq, job))
+
+    def submit_article(self, article, priority=None, arrived=None, signature=None):
+        """إضافة خبر للطابور؛ يعيد Future نتيجته True عند الإرسال
+
+        signature من التصفية إن وُجد، وإلا يُحسب هنا (الفحص اليدوي).
+        """
+        if priority is None:
+            priority = PRIORITY_IMPORTANT if article.type != "عام" else PRIORITY_GENERAL
+        if signature is None:
+            signature = minhash_signature(article)
+        future = asyncio.get_running_loop().create_future()
+        job = SendJob(None, [article], future, arrived, signature)
+        self._waiting[article.id] = job
+        self._put(priority, job)
+        return future
+
+    def is_waiting(self, article_id):
+        return article_id in self._waiting
+
+    def withdraw(self, article_id):
+        """سحب خبر لم يبدأ إرساله (تُلغى نتيجته)؛ False إن كان قد بدأ"""
+        job = self._waiting.pop(article_id, None)
+        if job is None:
+            return False
+        job.future.cancel()
+        return True
+
+    def _take(self, job):
+        """بدأ إرسال job: لم يعد يمكن سحبه"""
+        for article in job.articles:
+            if self._waiting.get(article.id) is job:
+                del self._waiting[article.id]
+
+    def submit_text(self, text):
+        """رسالة نصية عادية بأعلى أولوية"""
+        future = asyncio.get_running_loop().create_future()
+        self._put(PRIORITY_SYSTEM, SendJob(text, [], future))
+        return future
+
+    def _collect_digest(self, job):
+        """سحب أخبار عامة أخرى منتظرة لدمجها مع job"""
+        jobs = [job]
+        size = len(format_digest_line(job.articles[0]))
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            self._queue.task_done()
+            priority, _, other = item
+            if other.future.cancelled():
+                continue
+            line = format_digest_line(other.articles[0]) if other.articles else None
+            if priority != PRIORITY_GENERAL or line is None or size + len(line) + 2 > MESSAGE_LIMIT:
+                self._queue.put_nowait(item)
+                break
+            self._take(other)
+            jobs.append(other)
+            size += len(line) + 2
+        return jobs
+
+    def _render(self, jobs, fmt):
+        """نص رسالة خبر واحد، أو ملخص لعدة أخبار"""
+        if len(jobs) == 1:
+            return format_news_message(jobs[0].articles[0], fmt)
+        text, _ = fmt.pack_digest([j.articles[0] for j in jobs])
+        return text
+
+    async def _claim(self, jobs):
+        """حجز الأخبار قبل إرسالها عند تشغيل عدة نسخ؛ ما حجزته نسخة أخرى يُسقط"""
+        if coordinator is None:
+            return jobs
+        claimed = []
+        for job in jobs:
+            if await coordinator.claim(f"sent:{self.chat_id}:{job.articles[0].id}", SENT_TTL):
+                claimed.append(job)
+            else:
+                # أرسلته نسخة أخرى: يُسجل هنا أيضاً حتى لا يُعاد اختياره وحجزه في كل دورة
+                # ولا يُرسل خبر مشابه له بعد انتهاء الحجز
+                DEDUP_CHECKS.inc(self.chat_id, 'claimed')
+                for article in job.articles:
+                    sent_articles.add(self.key_prefix + article.id)
+                    self.recent.add(article.id, job.signature)
+                job.future.set_result(False)
+        return claimed
+
+    async def _release(self, jobs):
+        """فشل الإرسال: إلغاء الحجز حتى يُعاد المحاولة لاحقاً"""
+        if coordinator is None:
+            return
+        for job in jobs:
+            for article in job.articles:
+                await coordinator.release(f"sent:{self.chat_id}:{article.id}")
+
+    async def _run(self):
+        while True:
+            priority, _, job = await self._queue.get()
+            try:
+                if job.future.cancelled():
+                    continue  # سُحب قبل أن يصل دوره
+                self._take(job)
+                jobs = [job]
+                if job.text is not None:
+                    text, parse_mode = job.text, None
+                else:
+                    if self.digest and priority == PRIORITY_GENERAL and not self._queue.empty():
+                        jobs = self._collect_digest(job)
+                    jobs = await self._claim(jobs)
+                    if not jobs:
+                        continue
+                    text = self._render(jobs, message_format)
+                    parse_mode = message_format.parse_mode
+                await self._deliver(jobs, text, parse_mode)
+            except Exception as e:
+                logging.error(f"❌ خطأ غير متوقع: {e}")
+                for j in jobs:
+                    if not j.future.done():
+                        j.future.set_result(False)
+            finally:
+                self._queue.task_done()
+
+    async def _deliver(self, jobs, text, parse_mode):
+        bot = get_bot()
+        articles = [a for j in jobs for a in j.articles]
         
-        emoji = emoji_map.get(article['type'], '📰')
-        
-        # بناء الرسالة
-        message_lines = []
-        message_lines.append(f"{emoji} **{article['type'].upper()}** | {article['source']}")
-        message_lines.append("")
-        message_lines.append(f"{article['title']}")
-        message_lines.append("")
-        
-        if article['summary']:
-            message_lines.append(f"{article['summary']}")
-            message_lines.append("")
-        
-        message_lines.append(f"⏰ {article['time']}")
-        
-        if article['link']:
-            message_lines.append(f"🔗 [اقرأ المزيد]({article['link']})")
-        
-        message = "\n".join(message_lines)
+        for attempt in range(SEND_MAX_RETRIES + 1):
+            await self.limiter.acquire()
+            await global_send_limiter.acquire()
+            try:
+                with SEND_SECONDS.time(self.chat_id):
+                    await bot.send_message(
+                        chat_id=self.chat_id,
+                        text=text,
+                        parse_mode=parse_mode,
+                        disable_web_page_preview=False
+                    )
+            except error.RetryAfter as e:
+                TELEGRAM_ERRORS.inc(self.chat_id, 'RetryAfter')
+                RETRY_AFTER_SECONDS.inc(self.chat_id, amount=e.retry_after)
+                logging.warning(f"⏳ تليجرام يطلب الانتظار {e.retry_after} ثانية ({self.chat_id})")
+                self.limiter.pause(e.retry_after)
+                continue
+            except error.BadRequest as e:
+                TELEGRAM_ERRORS.inc(self.chat_id, 'BadRequest')
+                if "parse entities" in str(e) and parse_mode is not None and articles:
+                    # لا يُفترض أن يحدث مع التهريب؛ نعيد الإرسال كنص عادي بدل خسارة الخبر
+                    logging.warning(f"⚠️ تنسيق غير مقبول ({e})، إعادة الإرسال كنص عادي")
+                    text, parse_mode = self._render(jobs, MESSAGE_FORMATS['plain']), None
+                    continue
+                if "Chat not found" in str(e):
+                    logging.error(f"❌ القناة غير موجودة: {self.chat_id}")
+                    logging.error("⚠️ تأكد من:")
+                    logging.error("   1. القناة موجودة")
+                    logging.error("   2. البوت مسؤول في القناة")
+                    logging.error("   3. المعرف صحيح ويبدأ بـ @")
+                else:
+                    logging.error(f"❌ خطأ في الإرسال: {e}")
+                await self._release(jobs)
+                for j in jobs:
+                    j.future.set_exception(e)
+                return
+            except (error.TimedOut, error.NetworkError) as e:
+                TELEGRAM_ERRORS.inc(self.chat_id, type(e).__name__)
+                logging.warning(f"🔁 فشل مؤقت في الإرسال ({e})، محاولة {attempt + 1}")
+                await asyncio.sleep(min(60, 2 ** attempt))
+                continue
+            
+            delivered = time.time()
+            for j in jobs:
+                for article in j.articles:
+                    logging.info(f"✅ تم إرسال: {article.title[:50]}...")
+                    HEADLINE_LATENCY_SECONDS.observe(delivered - j.arrived, self.chat_id)
+                    sent_articles.add(self.key_prefix + article.id)
+                    self.recent.add(article.id, j.signature)
+                j.future.set_result(True)
+            return
         
-        # إرسال
-        await bot.send_message(
-            chat_id=CHANNEL_USERNAME,
-            text=message[:4000],
-            parse_mode='Markdown',
-            disable_web_page_preview=False
+        logging.error(f"❌ فشل الإرسال بعد {SEND_MAX_RETRIES + 1} محاولات")
+        await self._release(jobs)
+        for j in jobs:
+            j.future.set_result(False)
+
+def load_channels():
+    """القنوات من CHANNELS_FILE أو القناة الافتراضية"""
+    if not CHANNELS_FILE:
+        return [TelegramSendQueue(CHANNEL_USERNAME)]
+    with open(CHANNELS_FILE, encoding='utf-8') as f:
+        config = json.load(f)
+    channels = [
+        TelegramSendQueue(
+            entry['chat_id'],
+            per_minute=entry.get('rate', TELEGRAM_CHAT_RATE),
+            digest=entry.get('digest', SEND_DIGEST),
+            categories=entry.get('categories', ()),
+            sources=entry.get('sources', ()),
         )
+        for entry in config
+    ]
+    if not channels:
+        raise ValueError(f"❌ لا توجد قنوات في {CHANNELS_FILE}")
+    logging.info(f"📢 القنوات: {', '.join(c.chat_id for c in channels)}")
+    return channels
+
+channels = load_channels()
+send_queue = channels[0]  # القناة الأساسية (رسائل الاختبار والفحص اليدوي)
+Gauge('newsbot_send_queue_depth', 'Messages waiting in each channel queue', ('channel',),
+      lambda: {(queue.chat_id,): queue.qsize() for queue in channels})
+
+async def send_many(articles, queue=None, arrived=None, signatures=None):
+    """إضافة عدة أخبار للطابور دفعة واحدة وانتظار نتائجها
+
+    arrived و signatures (id -> وقت الوصول / التوقيع) من الدورة إن وُجدت.
+    """
+    queue = queue or send_queue
+    arrived = arrived or {}
+    signatures = signatures or {}
+    futures = [
+        queue.submit_article(article, arrived=arrived.get(article.id), signature=signatures.get(article.id))
+        for article in articles
+    ]
+    results = await asyncio.gather(*futures, return_exceptions=True)
+    return sum(1 for result in results if result is True)
+
+def select_for_channel(queue, articles, signatures, scores, limit, important=True):
+    """أعلى limit خبر للقناة مما لم يُرسل: المهمة، أو العامة إن كان important=False"""
+    best = TopK(limit)
+    
+    # مرور واحد بدون قوائم وسيطة أو ترتيب كامل
+    for article in articles:
+        if (article.type != "عام") != important:
+            continue
+        if not queue.accepts(article) or queue.already_sent(article, signatures.get(article.id)):
+            continue
+        best.push(scores[article.id], article)
+    
+    return best.items()
+
+class CycleDispatcher:
+    """تصفية وترتيب وإرسال أخبار دورة واحدة على دفعات أثناء وصولها
+
+    كل دفعة (ما وصل خلال PIPELINE_WINDOW) تُقارن بما سبقها في الدورة وتُرتب
+    ثم يُرسل منها لكل قناة ضمن حصتها: RANK_TOP_K خبر مهم خلال RANK_WINDOW
+    مهما تعددت الدورات. العامة تُجمع حتى نهاية الدورة وتُرسل فقط للقناة التي
+    لم يصلها خبر مهم، ضمن حصة RANK_GENERAL_K خلال نفس المدة.
+
+    تأكيد الخبر (عدد مصادره) يزيد مع الدفعات اللاحقة، لذلك المختار الذي لم
+    يبدأ إرساله يُعاد ترتيبه مع كل دفعة (ويُسحب إن تفوق عليه خبر أفضل)،
+    والعامة تُرتب في نهاية الدورة بعد اكتمال مصادرها.
+    """
+
+    def __init__(self, queues):
+        self.queues = queues
+        self.signatures = {}
+        self.sources = {}
+        self.arrived = {}  # id -> وقت وصول الخبر في هذه الدورة
+        self.index = NearDuplicateIndex(window=float('inf'), max_size=float('inf'))
+        self.held = []  # العامة المُبقاة حتى نهاية الدورة
+        self.contenders = {}  # id -> المهمة المُبقاة في الدورة
+        self.picks = {queue: [] for queue in queues}  # المهمة المختارة لكل قناة
+        self.futures = {queue: [] for queue in queues}
+        self.candidates = 0
+        self.kept = 0
+        self.important = 0
+
+    def sign(self, articles, arrived=None, signatures=None):
+        """تسجيل أخبار مصدر واحد فور وصولها مع توقيعاتها المحسوبة خارج الحلقة
+
+        ما لم يصل توقيعه يُحسب هنا (على الحلقة).
+        """
+        self.candidates += len(articles)
+        arrived = time.time() if arrived is None else arrived
+        signatures = signatures or {}
+        with NEAR_DUP_SECONDS.time():
+            for article in articles:
+                self.arrived.setdefault(article.id, arrived)
+                if article.id not in self.signatures:
+                    if article.id in signatures:
+                        self.signatures[article.id] = signatures[article.id]
+                    else:
+                        self.signatures[article.id] = minhash_signature(article)
+
+    def dispatch(self, articles):
+        """تصفية دفعة وترتيبها وإضافة المختار لطوابير القنوات بدون انتظار الإرسال"""
+        corroborated = set()
+        with NEAR_DUP_SECONDS.time():
+            kept = drop_near_duplicates(articles, self.signatures, self.sources, self.index, corroborated)
+        important = [a for a in kept if a.type != "عام"]
+        self.kept += len(kept)
+        self.important += len(important)
+        self.held.extend(a for a in kept if a.type == "عام")
+        # أخبار دفعات سابقة أكدتها هذه الدفعة: قد تتفوق الآن على ما اختير أو تجاوزته الحصة
+        earlier = [self.contenders[i] for i in corroborated if i in self.contenders]
+        self.contenders.update((a.id, a) for a in important)
+        for queue in self.queues:
+            picked = {a.id for a in self.picks[queue]}
+            candidates = important + [a for a in earlier if a.id not in picked]
+            # المختار سابقاً ولم يبدأ إرساله ينافس من جديد بتأكيده الحالي
+            waiting = [a for a in self.picks[queue] if queue.is_waiting(a.id)]
+            scores = rank_articles(candidates + waiting, self.sources)
+            limit = queue.important_quota.remaining() + len(waiting)
+            best = TopK(limit)
+            for article in waiting:  # يُقدّم عند التعادل فلا يُستبدل بلا سبب
+                best.push(scores[article.id], article)
+            for article in select_for_channel(queue, candidates, self.signatures, scores, limit):
+                best.push(scores[article.id], article)
+            chosen = {article.id: article for article in best.items()}
+            dropped = {a.id for a in waiting if a.id not in chosen and queue.withdraw(a.id)}
+            waiting_ids = {a.id for a in waiting}
+            new = [article for article in chosen.values() if article.id not in waiting_ids]
+            queue.important_quota.release(len(dropped))
+            queue.important_quota.take(len(new))
+            self.picks[queue] = [a for a in self.picks[queue] if a.id not in dropped] + new
+            self.futures[queue].extend(
+                queue.submit_article(article, arrived=self.arrived[article.id], signature=self.signatures[article.id])
+                for article in new
+            )
+
+    async def finish(self):
+        """انتظار الإرسال، ثم العامة للقنوات التي لم يصلها خبر مهم؛ عدد المرسل لكل قناة"""
+        scores = rank_articles(self.held, self.sources)
         
-        logging.info(f"✅ تم إرسال: {article['title'][:50]}...")
-        sent_articles.add(article['id'])
-        return True
-        
-    except error.BadRequest as e:
-        if "Chat not found" in str(e):
-            logging.error(f"❌ القناة غير موجودة: {CHANNEL_USERNAME}")
-            logging.error("⚠️ تأكد من:")
-            logging.error("   1. القناة موجودة")
-            logging.error("   2. البوت مسؤول في القناة")
-            logging.error("   3. المعرف صحيح ويبدأ بـ @")
-        else:
-            logging.error(f"❌ خطأ في الإرسال: {e}")
-        return False
+        async def finish_channel(queue):
+            results = await asyncio.gather(*self.futures[queue], return_exceptions=True)
+            sent = sum(1 for result in results if result is True)
+            if sent == 0:
+                general = select_for_channel(
+                    queue, self.held, self.signatures, scores, queue.general_quota.remaining(), important=False
+                )
+                if general:
+                    queue.general_quota.take(len(general))
+                    sent += await send_many(general, queue, self.arrived, self.signatures)
+            return sent
         
-    except Exception as e:
-        logging.error(f"❌ خطأ غير متوقع: {e}")
-        return False
+        return await asyncio.gather(*(finish_channel(queue) for queue in self.queues))
 
 # ========== الدورة الرئيسية ==========
 async def main_news_loop():
@@ -346,16 +2448,19 @@ async def main_news_loop():
     
     # اختبار البوت والقناة أولاً
     try:
-        bot = Bot(token=TELEGRAM_BOT_TOKEN)
+        bot = get_bot()
         bot_info = await bot.get_me()
         logging.info(f"🤖 البوت: @{bot_info.username}")
         
-        # اختبار إرسال رسالة
-        await bot.send_message(
-            chat_id=CHANNEL_USERNAME,
-            text="📢 بوت الأخبار المالية يعمل الآن!\nجاري تجميع آخر الأخبار..."
-        )
-        logging.info(f"✅ اختبار الإرسال ناجح إلى: {CHANNEL_USERNAME}")
+        # اختبار إرسال رسالة لكل قناة (مرة واحدة عند تشغيل عدة نسخ معاً)
+        for queue in channels:
+            queue.start()
+        startup = []
+        for queue in channels:
+            if coordinator is None or await coordinator.claim(f"startup:{queue.chat_id}", CHECK_INTERVAL):
+                startup.append(queue.submit_text("📢 بوت الأخبار المالية يعمل الآن!\nجاري تجميع آخر الأخبار..."))
+        await asyncio.gather(*startup)
+        logging.info(f"✅ اختبار الإرسال ناجح إلى: {', '.join(q.chat_id for q in channels)}")
         bot_started = True
         
     except error.BadRequest as e:
@@ -370,109 +2475,216 @@ async def main_news_loop():
         return
     
     # الدورة الرئيسية
-    async with aiohttp.ClientSession() as session:
-        while True:
+    while True:
+        feed_registry.reload_if_changed()
+        if feed_registry.next_due_time() <= time.time():
             try:
-                logging.info("=" * 60)
-                logging.info(f"🔄 بدء فحص: {datetime.now().strftime('%H:%M:%S')}")
-                
-                all_articles = []
-                
-                # جلب من مصادر RSS
-                tasks = []
-                for source_name, url in RSS_FEEDS:
-                    tasks.append(fetch_rss_safe(session, url, source_name))
-                
-                results = await asyncio.gather(*tasks, return_exceptions=True)
-                
-                for result in results:
-                    if isinstance(result, list):
-                        all_articles.extend(result)
-                
-                # تصفية وترتيب
-                important_articles = []
-                general_articles = []
-                
-                for article in all_articles:
-                    if article['type'] != "عام":
-                        important_articles.append(article)
-                    else:
-                        general_articles.append(article)
-                
-                # ترتيب حسب الأهمية والوقت
-                important_articles.sort(key=lambda x: x['timestamp'], reverse=True)
-                
-                # إرسال المهمة أولاً
-                sent_count = 0
-                for article in important_articles[:5]:  # أول 5 مهمة
-                    if article['id'] not in sent_articles:
-                        success = await send_news_to_channel(bot, article)
-                        if success:
-                            sent_count += 1
-                            await asyncio.sleep(2)  # انتظار بين الإرسال
-                
-                # إرسال عامة إذا لم يكن هناك مهمة
-                if sent_count == 0 and general_articles:
-                    for article in general_articles[:3]:  # أول 3 عامة
-                        if article['id'] not in sent_articles:
-                            success = await send_news_to_channel(bot, article)
-                            if success:
-                                sent_count += 1
-                                await asyncio.sleep(2)
-                
-                # تنظيف الذاكرة
-                if len(sent_articles) > 100:
-                    sent_articles.clear()
-                
-                # إحصائيات
-                logging.info("=" * 60)
-                logging.info(f"📊 النتائج:")
-                logging.info(f"   📝 إجمالي الأخبار: {len(all_articles)}")
-                logging.info(f"   ⭐ المهمة: {len(important_articles)}")
-                logging.info(f"   📰 العامة: {len(general_articles)}")
-                logging.info(f"   📤 المرسلة: {sent_count}")
-                logging.info("=" * 60)
-                
+                await run_cycle(get_http_session())
             except Exception as e:
                 logging.error(f"🚨 خطأ في الدورة: {e}")
-            
-            logging.info(f"⏳ الانتظار {CHECK_INTERVAL//60} دقيقة للفحص التالي...")
-            await asyncio.sleep(CHECK_INTERVAL)
+            next_due = feed_registry.next_due_time()
+            if next_due != float('inf'):
+                logging.info(f"⏳ الانتظار {int(max(0, next_due - time.time()))} ثانية للفحص التالي...")
+        
+        # النوم حتى يستحق أقرب مصدر، مع فحص ملف المصادر دورياً
+        wait = max(1, feed_registry.next_due_time() - time.time())
+        await asyncio.sleep(min(wait, FEEDS_RELOAD_INTERVAL))
 
-def run_quick_check():
-    """فحص يدوي سريع"""
-    async def quick():
+async def _fetch_stage(session, entry, batches):
+    """مرحلة الجلب والتحليل لمصدر واحد؛ الأخبار تُمرر فور جاهزيتها"""
+    state = get_feed_state(entry.url)
+    try:
+        articles = await fetch_rss_safe(session, entry.url, entry.source, entry)
+        # أخبار بلا توقيع (محملة من FeedCache): تُوقّع مرة واحدة خارج الحلقة وتُحفظ
+        missing = [a for a in articles if a.id not in state.signatures]
+        if missing:
+            state.signatures.update(await sign_offloaded(missing))
+    except Exception as e:
+        logging.error(f"❌ خطأ في {entry.source}: {e}")
+        articles = []
+    finally:
+        feed_registry.reschedule(entry)
+    signatures = {a.id: state.signatures[a.id] for a in articles if a.id in state.signatures}
+    # تنتظر هنا إذا تأخرت مرحلة التصفية (الطابور محدود)
+    await batches.put((time.time(), articles, signatures))
+
+async def _dispatch_stage(batches, dispatcher):
+    """مرحلة التصفية والترتيب والإرسال: تجمع الواصل PIPELINE_WINDOW ثانية ثم ترسله"""
+    loop = asyncio.get_running_loop()
+    pending = []
+    deadline = None
+    while True:
+        timeout = None if deadline is None else max(0.0, deadline - loop.time())
         try:
-            bot = Bot(token=TELEGRAM_BOT_TOKEN)
-            async with aiohttp.ClientSession() as session:
-                logging.info("🔍 فحص يدوي سريع...")
-                
-                # اختبار مصدر واحد
-                articles = await fetch_rss_safe(session, RSS_FEEDS[0][1], RSS_FEEDS[0][0])
-                
-                if articles:
-                    logging.info(f"✅ الفحص: {len(articles)} خبر")
-                    for article in articles[:2]:
-                        await send_news_to_channel(bot, article)
-                        await asyncio.sleep(1)
-                else:
-                    logging.warning("⚠️ لا توجد أخبار")
-                    
-        except Exception as e:
-            logging.error(f"❌ خطأ في الفحص: {e}")
+            batch = await asyncio.wait_for(batches.get(), timeout)
+        except asyncio.TimeoutError:
+            batch = (None, [], {})
+        if batch is None:
+            break
+        arrived, articles, signatures = batch
+        if articles:
+            dispatcher.sign(articles, arrived, signatures)
+            pending.extend(articles)
+            if deadline is None:
+                deadline = loop.time() + PIPELINE_WINDOW
+        if deadline is not None and loop.time() >= deadline:
+            dispatcher.dispatch(pending)
+            pending = []
+            deadline = None
+    if pending:
+        dispatcher.dispatch(pending)
+
+async def run_cycle(session):
+    """دورة فحص واحدة: جلب ← تحليل ← تصفية ← ترتيب ← إرسال كمراحل متصلة
+
+    أخبار المصدر السريع تُرسل خلال PIPELINE_WINDOW من وصولها دون انتظار
+    أبطأ مصدر، والطابور بين الجلب والتصفية محدود (PIPELINE_QUEUE_SIZE).
+    """
+    cycle_started = time.perf_counter()
+    logging.info("=" * 60)
+    logging.info(f"🔄 بدء فحص: {datetime.now().strftime('%H:%M:%S')}")
     
-    asyncio.run(quick())
+    reload_keywords_if_changed()
+    
+    # جلب من مصادر RSS المستحقة فقط (من heap السجل)
+    now = time.time()
+    due_entries = feed_registry.pop_due(now)
+    if coordinator is not None:
+        try:
+            due_entries, others = await coordinator.claim_feeds(due_entries)
+        except BaseException:
+            # التنسيق متعطل (قاعدة مقفلة، Redis متوقف...): المصادر المسحوبة تعود إلى heap
+            # وإلا لا يبقى مصدر مستحق ويتوقف الجلب نهائياً
+            others = due_entries
+            raise
+        finally:
+            for entry in others:
+                # مصدر نسخة أخرى (أو تعذر الحجز): تُفحص ملكيته مجدداً في موعده التالي
+                state = get_feed_state(entry.url)
+                state.next_due = now + state.interval
+                feed_registry.reschedule(entry)
+        if others:
+            logging.info(f"🤝 {len(due_entries)} مصدر لهذه النسخة، {len(others)} لنسخ أخرى")
+    dispatcher = CycleDispatcher(channels)
+    batches = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    
+    async def produce():
+        await asyncio.gather(*(_fetch_stage(session, entry, batches) for entry in due_entries))
+        await batches.put(None)
+    
+    producer = asyncio.create_task(produce())
+    consumer = asyncio.create_task(_dispatch_stage(batches, dispatcher))
+    try:
+        await asyncio.gather(producer, consumer)
+    finally:
+        # فشل مرحلة لا يترك الأخرى معلقة على الطابور
+        producer.cancel()
+        consumer.cancel()
+    if feed_cache is not None:
+        await feed_cache.save(entry.url for entry in due_entries)
+    
+    # انتظار الإرسال في كل القنوات (كل قناة بطابورها ومحددها)
+    sent_counts = await dispatcher.finish()
+    sent_count = sum(sent_counts)
+    
+    candidates = dispatcher.candidates
+    important_count = dispatcher.important
+    if candidates != dispatcher.kept:
+        logging.info(f"🧹 تم حذف {candidates - dispatcher.kept} خبر مكرر/متشابه")
+    
+    # تنظيف المخزن (العمر والحجم)
+    sent_articles.evict()
+    
+    # إحصائيات
+    logging.info("=" * 60)
+    logging.info(f"📊 النتائج:")
+    logging.info(f"   📝 إجمالي الأخبار: {dispatcher.kept}")
+    logging.info(f"   ⭐ المهمة: {important_count}")
+    logging.info(f"   📰 العامة: {dispatcher.kept - important_count}")
+    logging.info(f"   📤 المرسلة: {sent_count}")
+    if len(channels) > 1:
+        for queue, count in zip(channels, sent_counts):
+            logging.info(f"      {queue.chat_id}: {count}")
+    logging.info("=" * 60)
+    CYCLE_SECONDS.observe(time.perf_counter() - cycle_started)
+    
+    return {
+        'feeds': len(due_entries),
+        'candidates': candidates,
+        'articles': dispatcher.kept,
+        'important': important_count,
+        'sent': sent_count,
+    }
+
+async def run_quick_check():
+    """فحص يدوي سريع"""
+    try:
+        logging.info("🔍 فحص يدوي سريع...")
+        
+        # اختبار مصدر واحد
+        entry = feed_registry.first()
+        if entry is None:
+            logging.warning("⚠️ لا توجد مصادر مفعّلة")
+            return
+        try:
+            articles = await fetch_rss_safe(get_http_session(), entry.url, entry.source, entry)
+        finally:
+            # الجلب غيّر next_due فأصبح عنصره في heap قديماً
+            feed_registry.reschedule(entry)
+        
+        if articles:
+            logging.info(f"✅ الفحص: {len(articles)} خبر")
+            await send_many(articles[:2])
+        else:
+            logging.warning("⚠️ لا توجد أخبار")
+            
+    except Exception as e:
+        logging.error(f"❌ خطأ في الفحص: {e}")
 
-def start_bot_background():
-    """بدء البوت في الخلفية"""
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    loop.run_until_complete(main_news_loop())
+async def manual_check_worker():
+    """تنفيذ طلبات /check واحداً تلو الآخر"""
+    while True:
+        await manual_check_requests.get()
+        await run_quick_check()
 
-def run_flask_app():
-    """تشغيل Flask"""
+async def start_web_server():
+    """تشغيل خادم الويب على نفس حلقة البوت"""
+    web_app = web.Application()
+    web_app.add_routes(routes)
+    runner = web.AppRunner(web_app, access_log=None)
+    await runner.setup()
     port = int(os.getenv('PORT', 10000))
-    app.run(host='0.0.0.0', port=port, debug=False, use_reloader=False)
+    await web.TCPSite(runner, '0.0.0.0', port).start()
+    logging.info(f"🌐 خادم الويب على المنفذ {port}")
+    return runner
+
+async def main():
+    """الخادم والبوت على حلقة asyncio واحدة"""
+    if feed_cache is not None:
+        feed_cache.load()
+    runner = await start_web_server()
+    for queue in channels:
+        queue.start()
+    check_worker = asyncio.create_task(manual_check_worker())
+    lag_probe = asyncio.create_task(loop_lag_probe())
+    if coordinator is not None:
+        await coordinator.heartbeat()
+        heartbeat = asyncio.create_task(coordinator.heartbeat_loop())
+    try:
+        await main_news_loop()
+        # فشل بدء البوت: نُبقي الخادم يعمل (health و test-channel)
+        await asyncio.Event().wait()
+    finally:
+        check_worker.cancel()
+        lag_probe.cancel()
+        if coordinator is not None:
+            heartbeat.cancel()
+        reset_parse_executor()
+        await runner.cleanup()
+        if _http_session is not None:
+            await _http_session.close()
+        if _shared_bot is not None:
+            await _shared_bot.shutdown()
 
 # ========== التشغيل الرئيسي ==========
 if __name__ == "__main__":
@@ -487,23 +2699,11 @@ if __name__ == "__main__":
     logging.info("🚀 بدء تشغيل بوت الأخبار المالية")
     logging.info(f"📢 القناة: {CHANNEL_USERNAME}")
     logging.info(f"⏰ فترة الفحص: {CHECK_INTERVAL} ثانية ({CHECK_INTERVAL//60} دقيقة)")
-    logging.info(f"📡 مصادر RSS: {len(RSS_FEEDS)}")
+    logging.info(f"📡 مصادر RSS: {len(feed_registry)} ({feed_registry.host_count()} موقع)")
     logging.info("=" * 70)
     
-    # بدء Flask
-    flask_thread = threading.Thread(target=run_flask_app, daemon=True)
-    flask_thread.start()
-    
-    # تأخير ثم بدء البوت
-    time.sleep(3)
-    
-    # بدء البوت
-    bot_thread = threading.Thread(target=start_bot_background, daemon=True)
-    bot_thread.start()
-    
-    # إبقاء البرنامج يعمل
+    # تشغيل الخادم والبوت
     try:
-        while True:
-            time.sleep(3600)
+        asyncio.run(main())
     except KeyboardInterrupt:
         logging.info("👋 إيقاف البوت...")
@@ -0,0 +1,99 @@
+"""مقارنة المصنّف المُجمّع مع المصنّف القديم (بحث نصي لكل كلمة)
+
+التشغيل:
+    python benchmarks/bench_categorize.py [عدد العناوين]
+"""
+import os
+import sys
+import time
+import random
+
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', 'benchmark')
+os.environ.setdefault('SENT_DB_PATH', ':memory:')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import app  # noqa: E402
+
+FILLER = [
+    "stocks", "rally", "federal", "budget", "bank", "earnings", "investors", "market",
+    "shares", "after", "report", "week", "record", "ahead", "of", "the", "as", "on",
+    "البنك", "المركزي", "الأسواق", "ترتفع", "تنخفض", "اليوم", "بعد", "تقرير", "الأسبوع",
+]
+KEYWORD_WORDS = [
+    "oil", "crude", "gold", "inflation", "jobs", "war", "sanctions", "growth", "cpi",
+    "أسعار", "النفط", "الذهب", "التضخم",
+]
+# صيغ شائعة في العناوين المالية: الملكية والكلمات المركبة
+KEYWORD_FORMS = ["{}'s", "{}’s", "{}-price", "{}/silver", "({})"]
+# عناوين يجب أن تُصنّف (العنوان -> التصنيف المتوقع)
+EXPECTED = {
+    "Fed's Powell signals patience": 'فائدة',
+    "Oil's rally stalls": 'نفط',
+    "Oil-price surge": 'نفط',
+    "Gold/silver ratio widens": 'ذهب',
+    "OPEC’s output plan": 'نفط',
+    "Bank shares rise on earnings": 'عام',
+    "Federal budget talks resume": 'عام',
+}
+
+
+def categorize_news_substring(title, keywords_map=None):
+    """المصنّف القديم: أول تصنيف تظهر إحدى كلماته كنص جزئي"""
+    title_lower = title.lower()
+    for category, keywords in (keywords_map or app.KEYWORDS).items():
+        for keyword in keywords:
+            if keyword.lower() in title_lower:
+                return category
+    return "عام"
+
+
+def check_expected():
+    failures = [(title, app.categorize_news(title), expected)
+                for title, expected in EXPECTED.items() if app.categorize_news(title) != expected]
+    for title, got, expected in failures:
+        print(f"FAIL {title!r}: {got} (expected {expected})")
+    return not failures
+
+
+def main():
+    if not check_expected():
+        sys.exit(1)
+    n_titles = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rng = random.Random(42)
+    # عناوين واقعية: كلمات عادية مع 0-2 كلمات مفتاحية (بعضها بصيغة ملكية أو مركبة)
+    titles = []
+    for _ in range(n_titles):
+        keywords = [rng.choice(KEYWORD_FORMS).format(word) if rng.random() < 0.3 else word
+                    for word in rng.choices(KEYWORD_WORDS, k=rng.randint(0, 2))]
+        words = rng.choices(FILLER, k=rng.randint(6, 12)) + keywords
+        rng.shuffle(words)
+        titles.append(" ".join(words).capitalize() + ".")
+
+    # نفس الكلمات + 40 تصنيفاً إضافياً (كما لو نُقلت إلى ملف كلمات كبير)
+    big_keywords = dict(app.KEYWORDS)
+    for c in range(40):
+        big_keywords[f"extra{c}"] = [f"term{c}x{k}" for k in range(12)]
+    big_matcher = app.KeywordMatcher(big_keywords)
+
+    for scenario, keywords_map, matcher in (
+        (f"KEYWORDS ({sum(map(len, app.KEYWORDS.values()))} words)", app.KEYWORDS, app.keyword_matcher),
+        (f"large ({sum(map(len, big_keywords.values()))} words)", big_keywords, big_matcher),
+    ):
+        print(scenario)
+        results = {}
+        for label, fn in (
+            ("substring (old)", lambda t: categorize_news_substring(t, keywords_map)),
+            ("KeywordMatcher", matcher.scores),
+        ):
+            start = time.perf_counter()
+            results[label] = [fn(t) for t in titles]
+            elapsed = time.perf_counter() - start
+            print(f"  {label:18} {elapsed * 1000:9.1f} ms  {n_titles / elapsed:12,.0f} titles/s")
+
+        labels = [scores[0][0] if scores else "عام" for scores in results["KeywordMatcher"]]
+        differ = sum(a != b for a, b in zip(results["substring (old)"], labels))
+        print(f"  different top labels: {differ} / {n_titles} (substring hits such as 'ban' in 'bank')")
+
+
+if __name__ == "__main__":
+    main()
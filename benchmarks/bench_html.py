@@ -0,0 +1,99 @@
+"""مقارنة تحليل HTML القديم (BeautifulSoup) مع lxml (مرور واحد ومحددات الموقع)
+
+بدون وسائط تُستخدم صفحات اصطناعية بتركيب مواقع الأخبار (قوائم وسكربتات
+وبطاقات أخبار)، ومع --pages مجلد صفحات محفوظة (*.html) من مواقع حقيقية.
+
+التشغيل:
+    python benchmarks/bench_html.py [--pages DIR] [--limit 15]
+"""
+import os
+import sys
+import glob
+import time
+import random
+import argparse
+
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', 'benchmark')
+os.environ.setdefault('SENT_DB_PATH', ':memory:')
+os.environ.setdefault('FEED_CACHE_PATH', '')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import app  # noqa: E402
+
+ROUNDS = 5
+HEADLINES = [
+    "Oil prices climb as OPEC weighs deeper output cuts",
+    "Gold hits record as investors seek safe haven bullion",
+    "Fed signals interest rate path after inflation data",
+    "US jobs report shows unemployment steady at 4 percent",
+    "Markets close mixed ahead of holiday weekend trading",
+    "Tech shares lead broad rally on Wall Street today",
+    "ارتفاع أسعار النفط بعد قرار أوبك خفض الإنتاج",
+    "الذهب يسجل مستوى قياسياً مع تراجع الدولار الأمريكي",
+]
+# محددات الصفحة الاصطناعية (كما تُكتب في ملف المصادر)
+SELECTORS = {"item": "//div[@class='card']", "title": ".//h3", "link": ".//h3/a/@href", "time": ".//time/@datetime"}
+# نفس الصفحة بمحددات تعيد عناصر (كما تفعل محددات CSS دائماً)
+ELEMENT_SELECTORS = {"item": "//div[@class='card']", "title": ".//h3", "link": ".//h3/a", "time": ".//time"}
+
+
+def make_page(n_cards, rng):
+    """صفحة أخبار كبيرة: ترويسة وسكربتات وقائمة تنقل ثم بطاقات أخبار"""
+    scripts = "".join(f"<script>window.cfg{i} = {{'a': '<h2>not a headline</h2>'}};</script>" for i in range(30))
+    menu = "".join(f"<li><a href='/section/{i}'>Section {i}</a></li>" for i in range(200))
+    cards = "".join(
+        f"<div class='card'><span class='kicker'>Markets</span>"
+        f"<h3><a href='/news/{i}'>{rng.choice(HEADLINES)} ({i})</a></h3>"
+        f"<p>{'Analysts weigh the outlook for the coming quarter. ' * 6}</p>"
+        f"<time datetime='2025-01-06T10:{i % 60:02d}:00Z'>Jan 6</time></div>"
+        for i in range(n_cards)
+    )
+    footer = "".join(f"<p><a href='/legal/{i}'>Legal notice {i}</a></p>" for i in range(100))
+    return (f"<!doctype html><html><head><meta charset='utf-8'><title>News</title>{scripts}</head>"
+            f"<body><header><h1>Financial News Network Homepage</h1><nav><ul>{menu}</ul></nav></header>"
+            f"<main>{cards}</main><footer>{footer}</footer></body></html>").encode()
+
+
+def measure(fn):
+    best = float('inf')
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', help='directory of saved *.html pages')
+    parser.add_argument('--limit', type=int, default=15)
+    args = parser.parse_args()
+
+    if args.pages:
+        pages = [(os.path.basename(path), open(path, 'rb').read(), None)
+                 for path in sorted(glob.glob(os.path.join(args.pages, '*.html')))]
+    else:
+        rng = random.Random(3)
+        pages = [(f"synthetic-{n}", make_page(n, rng), SELECTORS) for n in (20, 100, 400)]
+
+    for name, body, selectors in pages:
+        print(f"{name}: {len(body) / 1e3:.0f} KB")
+        runs = [
+            ("beautifulsoup (old)", lambda: app._parse_html_soup(body, "bench", args.limit)),
+            ("lxml single pass", lambda: app.parse_html_for_news(body, "bench", args.limit, url="https://example.com/")),
+        ]
+        if selectors:
+            runs.append(("lxml selectors", lambda: app.parse_html_for_news(
+                body, "bench", args.limit, url="https://example.com/", selectors=selectors)))
+            runs.append(("lxml element sel.", lambda: app.parse_html_for_news(
+                body, "bench", args.limit, url="https://example.com/", selectors=ELEMENT_SELECTORS)))
+        for label, fn in runs:
+            elapsed, articles = measure(fn)
+            links = sum(1 for a in articles if a.link)
+            dated = sum(1 for a in articles if a.time not in ("حديث", ""))
+            print(f"  {label:20} {elapsed * 1000:9.2f} ms  articles {len(articles):3}  "
+                  f"with link {links:3}  with time {dated:3}")
+
+
+if __name__ == "__main__":
+    main()
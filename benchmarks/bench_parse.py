@@ -0,0 +1,96 @@
+"""مقارنة parse_rss_xml مع parse_rss_stream على ملفات RSS/Atom كبيرة
+
+التشغيل:
+    python benchmarks/bench_parse.py [عدد الأخبار]
+"""
+import os
+import sys
+import time
+import asyncio
+import tracemalloc
+
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', 'benchmark')
+os.environ.setdefault('SENT_DB_PATH', ':memory:')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import app  # noqa: E402
+
+CHUNK_SIZE = 16384
+ROUNDS = 5
+
+
+def make_rss(n_items):
+    items = "".join(
+        f"<item><title>Oil prices move on OPEC decision number {i}</title>"
+        f"<link>https://example.com/news/{i}</link>"
+        f"<pubDate>Mon, 06 Jan 2025 10:{i % 60:02d}:00 GMT</pubDate>"
+        f"<description>{'Crude futures and energy markets. ' * 20}</description></item>"
+        for i in range(n_items)
+    )
+    return f'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel><title>t</title>{items}</channel></rss>'
+
+
+def make_atom(n_items):
+    entries = "".join(
+        f"<entry><title>Gold rallies as central bank signals rate cut {i}</title>"
+        f'<link href="https://example.com/atom/{i}"/>'
+        f"<published>2025-01-06T10:{i % 60:02d}:00Z</published>"
+        f"<summary>{'Bullion and precious metals. ' * 20}</summary></entry>"
+        for i in range(n_items)
+    )
+    return f'<?xml version="1.0" encoding="UTF-8"?><feed xmlns="http://www.w3.org/2005/Atom"><title>t</title>{entries}</feed>'
+
+
+async def _chunks(data):
+    for i in range(0, len(data), CHUNK_SIZE):
+        yield data[i:i + CHUNK_SIZE]
+
+
+def measure(fn):
+    """أفضل زمن من عدة جولات + ذروة الذاكرة"""
+    best = float('inf')
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, len(result)
+
+
+def check_fields():
+    """الوقت والملخص والرابط يصلون من RSS و Atom في المحللين"""
+    failures = []
+    for name, text in (("RSS", make_rss(3)), ("Atom", make_atom(3))):
+        data = text.encode()
+        for label, articles in (
+            ("parse_rss_xml", app.parse_rss_xml(text, "bench")),
+            ("parse_rss_stream", asyncio.run(app.parse_rss_stream(_chunks(data), "bench"))),
+        ):
+            article = articles[0] if articles else None
+            if article is None or article.time == "قبل قليل" or not article.summary or not article.link:
+                failures.append(f"{name} {label}: {article}")
+            elif article.published == article.timestamp:
+                failures.append(f"{name} {label}: unparsed date {article.time!r}")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return not failures
+
+
+def main():
+    if not check_fields():
+        sys.exit(1)
+    n_items = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    for name, text in (("RSS", make_rss(n_items)), ("Atom", make_atom(n_items))):
+        data = text.encode()
+        batch = measure(lambda: app.parse_rss_xml(text, "bench"))
+        stream = measure(lambda: asyncio.run(app.parse_rss_stream(_chunks(data), "bench")))
+        print(f"{name}: {n_items} items, {len(data) / 1e6:.1f} MB")
+        for label, (elapsed, peak, count) in (("parse_rss_xml", batch), ("parse_rss_stream", stream)):
+            print(f"  {label:18} {elapsed * 1000:9.2f} ms  peak {peak / 1e6:7.2f} MB  articles {count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""التحقق من أن المصادر التي لم تتغير لا يُعاد تحليلها (خادم محلي)
+
+ثلاث حالات على خادم aiohttp محلي، كل مصدر يُجلب عدة مرات بـ app.fetch_rss_safe:
+  - 304: مصدر بـ ETag يرد 304 على الطلب الشرطي فلا يُقرأ ولا يُحلل شيء
+  - نفس المحتوى: صفحة HTML بدون مدققات تعيد نفس المحتوى فتُتجاوز ببصمتها
+  - التوقف المبكر: RSS كبير بدون مدققات يُرسل على أجزاء، فيتوقف التحليل
+    التدريجي عند أول خبر معروف ولا يُقرأ باقي الملف
+  - جسم مقطوع: رد 200 بـ ETag ينقطع في منتصفه، فلا تُحفظ مدققاته والطلب
+    التالي غير شرطي (وإلا يرد الخادم 304 وتضيع أخبار هذه النسخة)
+
+يطبع PASS/FAIL لكل فحص ويخرج بـ 1 عند أي فشل.
+
+التشغيل:
+    python benchmarks/conditional_test.py [--items 3000]
+"""
+import os
+import sys
+import asyncio
+import argparse
+
+from aiohttp import web
+
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', 'benchmark')
+os.environ.setdefault('SENT_DB_PATH', ':memory:')
+os.environ.setdefault('FEED_CACHE_PATH', '')
+os.environ.setdefault('PARSE_MODE', 'inline')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import app  # noqa: E402
+
+CHUNK_SIZE = 16384
+ETAG = '"v1"'
+
+
+def make_rss(numbers):
+    """RSS بالأخبار المعطاة (الأحدث أولاً)"""
+    items = "".join(
+        f"<item><title>Story {i}: oil prices move on OPEC decision</title>"
+        f"<link>https://example.com/news/{i}</link>"
+        f"<pubDate>Mon, 06 Jan 2025 10:{i % 60:02d}:00 GMT</pubDate>"
+        f"<description>{'Crude futures and energy markets. ' * 6}</description></item>"
+        for i in numbers
+    )
+    return f'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel><title>t</title>{items}</channel></rss>'.encode()
+
+
+def make_html(n_items):
+    cards = "".join(
+        f"<div class='story'><h3><a href='/story/{i}'>Story {i}: gold hits record as investors seek safety</a></h3></div>"
+        for i in range(n_items)
+    )
+    return f"<html><body><main>{cards}</main></body></html>".encode()
+
+
+class StubFeeds:
+    """المصادر الثلاثة مع عدّ الردود والبايتات المرسلة"""
+
+    def __init__(self, items):
+        self.items = items
+        self.stream_body = make_rss(range(items, 0, -1))
+        self.html_body = make_html(20)
+        self.sent = 0  # بايتات /stream.xml التي كُتبت فعلاً
+        self.truncate = True  # أول رد على /truncated.xml ينقطع
+
+    async def etag(self, request):
+        if request.headers.get('If-None-Match') == ETAG:
+            return web.Response(status=304, headers={'ETag': ETAG})
+        return web.Response(body=make_rss(range(20, 0, -1)), content_type='application/rss+xml', headers={'ETag': ETAG})
+
+    async def truncated(self, request):
+        if request.headers.get('If-None-Match') == ETAG:
+            return web.Response(status=304, headers={'ETag': ETAG})
+        body = make_rss(range(20, 0, -1))
+        if not self.truncate:
+            return web.Response(body=body, content_type='application/rss+xml', headers={'ETag': ETAG})
+        self.truncate = False
+        response = web.StreamResponse(headers={'Content-Type': 'application/rss+xml', 'ETag': ETAG})
+        response.content_length = len(body)
+        await response.prepare(request)
+        await response.write(body[:len(body) // 2])
+        request.transport.close()  # الاتصال ينقطع قبل اكتمال الجسم
+        return response
+
+    async def page(self, request):
+        return web.Response(body=self.html_body, content_type='text/html')
+
+    async def stream(self, request):
+        response = web.StreamResponse(headers={'Content-Type': 'application/rss+xml'})
+        response.content_length = len(self.stream_body)
+        await response.prepare(request)
+        try:
+            for i in range(0, len(self.stream_body), CHUNK_SIZE):
+                await response.write(self.stream_body[i:i + CHUNK_SIZE])
+                self.sent += CHUNK_SIZE
+                await asyncio.sleep(0.001)  # شبكة حقيقية: الأجزاء تصل تباعاً
+        except (ConnectionResetError, asyncio.CancelledError):
+            pass  # العميل أغلق الاتصال بعد التوقف المبكر
+        return response
+
+
+def counter(metric, *labels):
+    return metric._values.get(labels, 0)
+
+
+def hist_count(metric, *labels):
+    data = metric._values.get(labels)
+    return data[-1] if data else 0
+
+
+async def run(args):
+    stub = StubFeeds(args.items)
+    server = web.Application()
+    server.router.add_get('/etag.xml', stub.etag)
+    server.router.add_get('/page.html', stub.page)
+    server.router.add_get('/stream.xml', stub.stream)
+    server.router.add_get('/truncated.xml', stub.truncated)
+    runner = web.AppRunner(server, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', args.port).start()
+    base = f"http://127.0.0.1:{args.port}"
+    session = app.get_http_session()
+    results = []
+
+    def check(name, ok, detail):
+        results.append(ok)
+        print(f"{'PASS' if ok else 'FAIL'} {name}: {detail}")
+
+    try:
+        # 304: الطلب الثاني شرطي والخادم يرد 304
+        entry = app.FeedEntry(f"{base}/etag.xml", 'etag', parser='rss')
+        first = await app.fetch_rss_safe(session, entry.url, entry.source, entry)
+        parsed = counter(app.PARSED_ITEMS, 'rss_stream')
+        second = await app.fetch_rss_safe(session, entry.url, entry.source, entry)
+        check("304 not modified",
+              counter(app.FETCH_RESPONSES, 'etag', 304) == 1 and counter(app.PARSED_ITEMS, 'rss_stream') == parsed
+              and second == first and len(first) == app.RSS_ITEM_LIMIT,
+              f"{len(first)} articles, 304 responses {counter(app.FETCH_RESPONSES, 'etag', 304)}, "
+              f"items parsed on revisit {counter(app.PARSED_ITEMS, 'rss_stream') - parsed}")
+
+        # نفس المحتوى بدون مدققات: لا يُعاد تحليل HTML
+        entry = app.FeedEntry(f"{base}/page.html", 'page', parser='html')
+        first = await app.fetch_rss_safe(session, entry.url, entry.source, entry)
+        parses = hist_count(app.PARSE_SECONDS, 'html')
+        for _ in range(3):
+            again = await app.fetch_rss_safe(session, entry.url, entry.source, entry)
+        check("identical body skipped",
+              hist_count(app.PARSE_SECONDS, 'html') == parses and again == first and first,
+              f"{len(first)} articles, html parses on 3 revisits {hist_count(app.PARSE_SECONDS, 'html') - parses}")
+
+        # التوقف المبكر: أول زيارة تقف عند الحد، والزيارة التالية عند أول خبر معروف
+        entry = app.FeedEntry(f"{base}/stream.xml", 'stream', parser='rss')
+        size = len(stub.stream_body)
+        first = await app.fetch_rss_safe(session, entry.url, entry.source, entry)
+        read_first = counter(app.FETCH_BYTES, 'stream')
+        parsed = counter(app.PARSED_ITEMS, 'rss_stream')
+        again = await app.fetch_rss_safe(session, entry.url, entry.source, entry)
+        read_again = counter(app.FETCH_BYTES, 'stream') - read_first
+        check("unchanged stream stops at first known item",
+              again == first and counter(app.PARSED_ITEMS, 'rss_stream') == parsed and read_again < size / 10,
+              f"body {size / 1e3:.0f} KB, read {read_first / 1e3:.0f} KB then {read_again / 1e3:.0f} KB, "
+              f"new items on revisit {counter(app.PARSED_ITEMS, 'rss_stream') - parsed}")
+
+        # خبران جديدان في أعلى الملف: يُحللان فقط
+        stub.stream_body = make_rss(range(args.items + 2, 0, -1))
+        parsed = counter(app.PARSED_ITEMS, 'rss_stream')
+        updated = await app.fetch_rss_safe(session, entry.url, entry.source, entry)
+        new = counter(app.PARSED_ITEMS, 'rss_stream') - parsed
+        check("only new items parsed", new == 2 and updated[2:] == first[:len(updated) - 2],
+              f"new items {new}, total kept {len(updated)}")
+
+        # جسم مقطوع: لا تُحفظ مدققاته، فالطلب التالي يجلب النسخة كاملة
+        entry = app.FeedEntry(f"{base}/truncated.xml", 'truncated', parser='rss')
+        counts = []
+        for _ in range(3):
+            counts.append(len(await app.fetch_rss_safe(session, entry.url, entry.source, entry)))
+        check("truncated body keeps old validators", counts[0] == 0 and counts[1] == app.RSS_ITEM_LIMIT
+              and counter(app.FETCH_RESPONSES, 'truncated', 304) == 1,
+              f"articles per fetch {counts}, 304 responses {counter(app.FETCH_RESPONSES, 'truncated', 304)}")
+        print(f"stub wrote {stub.sent / 1e3:.0f} KB of /stream.xml over 3 requests ({3 * size / 1e3:.0f} KB served in full)")
+    finally:
+        await session.close()
+        await runner.cleanup()
+    return all(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=3000, help='items in the large streamed feed')
+    parser.add_argument('--port', type=int, default=8970)
+    args = parser.parse_args()
+    if not asyncio.run(run(args)):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""اختبار حمل لدورة كاملة من main_news_loop على خوادم محلية
+
+يشغّل في عملية منفصلة خادم aiohttp يقدّم مئات/آلاف المصادر الاصطناعية
+(RSS و Atom و HTML) مع تأخير وأخطاء و XML تالف حسب الإعدادات، إضافة إلى
+Bot API وهمي لتليجرام. ثم ينفذ app.run_cycle مرة (أو أكثر) ويطبع زمن
+الدورة وذروة الذاكرة ووقت المعالج لكل مرحلة وعدد الأخبار في الثانية.
+
+التشغيل:
+    python benchmarks/load_test.py --feeds 1000 --items 30 --latency 0.2
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import resource
+import multiprocessing
+
+from aiohttp import web
+
+KEYWORD_TITLES = [
+    "Oil prices climb as OPEC weighs deeper output cuts",
+    "Gold hits record as investors seek safe haven bullion",
+    "Fed signals interest rate path after inflation data",
+    "US jobs report shows unemployment steady at 4 percent",
+    "Sanctions on exporters tighten energy supply outlook",
+    "ارتفاع أسعار النفط بعد قرار أوبك خفض الإنتاج",
+    "الذهب يسجل مستوى قياسياً مع تراجع الدولار",
+]
+FILLER_TITLES = [
+    "Markets close mixed ahead of holiday weekend",
+    "Tech shares lead broad rally on Wall Street",
+    "Retailers report quarterly results above forecasts",
+]
+
+
+def _titles(feed_no, n_items, rng):
+    # جزء من الأخبار مشترك بين المصادر (نفس القصة من أكثر من مصدر)
+    for i in range(n_items):
+        if rng.random() < 0.2:
+            yield rng.choice(KEYWORD_TITLES)
+        else:
+            base = rng.choice(KEYWORD_TITLES + FILLER_TITLES)
+            yield f"{base} (feed {feed_no} story {i})"
+
+
+def make_rss(feed_no, n_items, rng):
+    items = "".join(
+        f"<item><title>{title}</title><link>https://example.com/{feed_no}/{i}</link>"
+        f"<pubDate>Mon, 06 Jan 2025 10:{i % 60:02d}:00 GMT</pubDate>"
+        f"<description>{'Market commentary and analysis. ' * 8}</description></item>"
+        for i, title in enumerate(_titles(feed_no, n_items, rng))
+    )
+    return f'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel><title>f{feed_no}</title>{items}</channel></rss>'
+
+
+def make_atom(feed_no, n_items, rng):
+    entries = "".join(
+        f'<entry><title>{title}</title><link href="https://example.com/a/{feed_no}/{i}"/>'
+        f"<published>2025-01-06T10:{i % 60:02d}:00Z</published>"
+        f"<summary>{'Analysts weigh the outlook. ' * 8}</summary></entry>"
+        for i, title in enumerate(_titles(feed_no, n_items, rng))
+    )
+    return f'<?xml version="1.0" encoding="UTF-8"?><feed xmlns="http://www.w3.org/2005/Atom"><title>f{feed_no}</title>{entries}</feed>'
+
+
+def make_html(feed_no, n_items, rng):
+    blocks = "".join(
+        f"<div class='story'><h3><a href='/story/{feed_no}/{i}'>{title}</a></h3><p>{'Text. ' * 40}</p></div>"
+        for i, title in enumerate(_titles(feed_no, n_items, rng))
+    )
+    return f"<html><head><title>f{feed_no}</title></head><body><nav>{'<a>menu</a>' * 50}</nav>{blocks}</body></html>"
+
+
+def make_malformed(feed_no, n_items, rng):
+    # & غير مهرّب ووسم غير مغلق
+    return make_rss(feed_no, n_items, rng).replace("Market commentary", "S&P commentary", 1).replace("</channel>", "")
+
+
+def build_feeds(args):
+    """المسار -> (المحتوى, نوع المحتوى, خطأ؟)"""
+    rng = random.Random(args.seed)
+    feeds = {}
+    for n in range(args.feeds):
+        roll = rng.random()
+        if roll < args.error_rate:
+            feeds[f"/feed/{n}.xml"] = (b"", "text/plain", True)
+        elif roll < args.error_rate + args.malformed_rate:
+            feeds[f"/feed/{n}.xml"] = (make_malformed(n, args.items, rng).encode(), "application/rss+xml", False)
+        elif roll < args.error_rate + args.malformed_rate + args.html_rate:
+            feeds[f"/page/{n}.html"] = (make_html(n, args.items, rng).encode(), "text/html", False)
+        elif roll < args.error_rate + args.malformed_rate + args.html_rate + args.atom_rate:
+            feeds[f"/feed/{n}.xml"] = (make_atom(n, args.items, rng).encode(), "application/atom+xml", False)
+        else:
+            feeds[f"/feed/{n}.xml"] = (make_rss(n, args.items, rng).encode(), "application/rss+xml", False)
+    return feeds
+
+
+def run_stub_server(args, ready):
+    """خادم المصادر + Bot API وهمي (في عملية منفصلة)"""
+    feeds = build_feeds(args)
+    rng = random.Random(args.seed)
+
+    async def feed(request):
+        body, content_type, failing = feeds[request.path]
+        if args.latency:
+            await asyncio.sleep(rng.uniform(0, 2 * args.latency))
+        if failing:
+            return web.Response(status=500, text="error")
+        return web.Response(body=body, content_type=content_type)
+
+    message_id = 0
+
+    async def bot_api(request):
+        nonlocal message_id
+        method = request.match_info['method']
+        if method == 'getMe':
+            return web.json_response({'ok': True, 'result': {
+                'id': 1, 'is_bot': True, 'first_name': 'bench', 'username': 'bench_bot'}})
+        await request.read()
+        message_id += 1
+        return web.json_response({'ok': True, 'result': {
+            'message_id': message_id, 'date': int(time.time()),
+            'chat': {'id': 1, 'type': 'channel'}, 'text': ''}})
+
+    async def main():
+        stub = web.Application()
+        for path in feeds:
+            stub.router.add_get(path, feed)
+        stub.router.add_post('/bot{token}/{method}', bot_api)
+        runner = web.AppRunner(stub, access_log=None)
+        await runner.setup()
+        # عدة "مواقع" على عناوين loopback مختلفة (حدود الجلب لكل موقع)
+        for address in _host_addresses(args):
+            await web.TCPSite(runner, address, args.port, backlog=4096).start()
+        ready.set()
+        await asyncio.Event().wait()
+
+    asyncio.run(main())
+
+
+def _host_addresses(args):
+    return [f"127.0.0.{1 + n}" for n in range(args.hosts)]
+
+
+async def _probe_lag(samples, interval=0.01):
+    """مثل app.loop_lag_probe لكن يحتفظ بكل القياسات"""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, loop.time() - started - interval))
+
+
+def _hist_sum(histogram):
+    return sum(data[-2] for data in histogram._values.values())
+
+
+def _hist_count(histogram):
+    return sum(data[-1] for data in histogram._values.values())
+
+
+async def drive(args):
+    import app
+
+    addresses = _host_addresses(args)
+    app.feed_registry.set_entries([
+        app.FeedEntry(f"http://{addresses[n % len(addresses)]}:{args.port}{path}", f"source-{n}")
+        for n, path in enumerate(build_feeds(args))
+    ])
+    for queue in app.channels:
+        queue.start()
+
+    stage_metrics = (
+        ("parse", app.PARSE_SECONDS), ("categorize", app.CATEGORIZE_SECONDS),
+        ("near_dup", app.NEAR_DUP_SECONDS), ("rank", app.RANK_SECONDS), ("send", app.SEND_SECONDS),
+        ("fetch", app.FETCH_SECONDS),
+    )
+    session = app.get_http_session()
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    for cycle in range(args.cycles):
+        # كل المصادر مستحقة في كل دورة
+        app.feed_registry.mark_all_due()
+        before = {label: _hist_sum(h) for label, h in stage_metrics}
+        latency_before = (_hist_sum(app.HEADLINE_LATENCY_SECONDS), _hist_count(app.HEADLINE_LATENCY_SECONDS))
+        lags = []
+        probe = asyncio.create_task(_probe_lag(lags))
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        stats = await app.run_cycle(session)
+        wall = time.perf_counter() - wall_start
+        probe.cancel()
+        lags.sort()
+        cpu = time.process_time() - cpu_start
+        stages = {label: _hist_sum(h) - before[label] for label, h in stage_metrics}
+        peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+        print(f"cycle {cycle + 1}: {stats['feeds']} feeds, {stats['candidates']} parsed, "
+              f"{stats['articles']} after dedup, {stats['sent']} sent")
+        print(f"  wall {wall:.2f} s  cpu {cpu:.2f} s  peak RSS {peak_mb:.1f} MB "
+              f"(+{(peak_mb - rss_before / 1024):.1f} MB during run)")
+        print(f"  articles/s {stats['candidates'] / wall:,.0f}")
+        print(f"  parse cpu {stages['parse']:.3f} s  categorize {stages['categorize']:.3f} s  "
+              f"near-dup {stages['near_dup']:.3f} s  rank {stages['rank']:.3f} s")
+        print(f"  send wall {stages['send']:.3f} s  fetch wall (summed over feeds) {stages['fetch']:.1f} s")
+        delivered = _hist_count(app.HEADLINE_LATENCY_SECONDS) - latency_before[1]
+        if delivered:
+            latency = (_hist_sum(app.HEADLINE_LATENCY_SECONDS) - latency_before[0]) / delivered
+            print(f"  headline latency (arrival -> delivered) mean {latency:.2f} s over {delivered} messages")
+        if lags:
+            print(f"  loop lag p50 {lags[len(lags) // 2] * 1000:.1f} ms  "
+                  f"p99 {lags[int(len(lags) * 0.99)] * 1000:.1f} ms  max {lags[-1] * 1000:.1f} ms")
+    await session.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--feeds', type=int, default=500)
+    parser.add_argument('--items', type=int, default=30, help='items per feed')
+    parser.add_argument('--latency', type=float, default=0.05, help='mean response delay (s)')
+    parser.add_argument('--error-rate', type=float, default=0.02)
+    parser.add_argument('--malformed-rate', type=float, default=0.02)
+    parser.add_argument('--html-rate', type=float, default=0.1)
+    parser.add_argument('--atom-rate', type=float, default=0.3)
+    parser.add_argument('--hosts', type=int, default=50, help='distinct loopback hosts (max 254)')
+    parser.add_argument('--cycles', type=int, default=2)
+    parser.add_argument('--parse-mode', choices=('process', 'thread', 'inline'), default=None,
+                        help='override PARSE_MODE')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    ready = multiprocessing.Event()
+    server = multiprocessing.Process(target=run_stub_server, args=(args, ready), daemon=True)
+    server.start()
+    ready.wait(60)
+
+    os.environ.setdefault('TELEGRAM_BOT_TOKEN', '123:benchmark')
+    os.environ.setdefault('SENT_DB_PATH', ':memory:')
+    if args.parse_mode:
+        os.environ['PARSE_MODE'] = args.parse_mode
+    os.environ['TELEGRAM_API_URL'] = f"http://127.0.0.1:{args.port}"
+    os.environ.setdefault('TELEGRAM_CHAT_RATE', '1000000')
+    os.environ.setdefault('TELEGRAM_GLOBAL_RATE', '1000000')
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+    try:
+        asyncio.run(drive(args))
+    finally:
+        server.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""التحقق من أن إزالة المتشابه لا تدمج أخباراً متعاكسة
+
+أزواج عناوين تختلف في كلمة الاتجاه فقط (ارتفع/انخفض، Higher/Lower) يجب أن
+تبقى خبرين، ونسخ نفس الخبر من مصادر مختلفة (لاحقة اسم الوكالة، اختلاف
+حالة الأحرف والترقيم) يجب أن تُدمج. كل زوج يمر بـ app.drop_near_duplicates
+كما في الدورة، والعتبة من NEAR_DUP_THRESHOLD.
+
+يطبع PASS/FAIL لكل زوج مع التشابه المقدّر ويخرج بـ 1 عند أي فشل.
+
+التشغيل:
+    python benchmarks/near_dup_test.py
+"""
+import os
+import sys
+
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', 'benchmark')
+os.environ.setdefault('SENT_DB_PATH', ':memory:')
+os.environ.setdefault('FEED_CACHE_PATH', '')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import app  # noqa: E402
+
+# (العنوان الأول، الثاني، يُدمجان؟)
+PAIRS = (
+    ("Crude Oil Futures Settle Higher", "Crude Oil Futures Settle Lower", False),
+    ("Gold prices rise as dollar weakens", "Gold prices fall as dollar weakens", False),
+    ("Fed raises interest rates by 25 basis points", "Fed cuts interest rates by 25 basis points", False),
+    ("Dow Jones closes up 300 points on tech rally", "Dow Jones closes down 300 points on tech rally", False),
+    ("Bitcoin climbs above $60,000 for the first time since March",
+     "Bitcoin falls below $60,000 for the first time since March", False),
+    ("ارتفاع أسعار النفط بعد قرار أوبك خفض الإنتاج", "انخفاض أسعار النفط بعد قرار أوبك خفض الإنتاج", False),
+    ("US stocks open higher", "US stocks open lower", False),
+    ("Oil prices rise after OPEC agrees to cut output",
+     "Oil prices rise after OPEC agrees to cut output - Reuters", True),
+    ("Gold hits record high as investors seek safety", "GOLD HITS RECORD HIGH, AS INVESTORS SEEK SAFETY", True),
+    ("البنك المركزي يثبت أسعار الفائدة للمرة الثالثة على التوالي",
+     "البنك المركزي يثبت أسعار الفائدة للمرة الثالثة على التوالي - رويترز", True),
+)
+
+
+def make_article(n, title):
+    return app.Article(f"id{n}", title, "", "", "", "عام", f"source-{n}", 0, None)
+
+
+def similarity(first, second):
+    """التشابه المقدّر من التوقيعين (0 إن كان أحدهما قصيراً جداً)"""
+    a, b = app.minhash_signature(first), app.minhash_signature(second)
+    if a is None or b is None:
+        return 0.0
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+def main():
+    failed = 0
+    for first_title, second_title, merge in PAIRS:
+        first, second = make_article(1, first_title), make_article(2, second_title)
+        merged = len(app.drop_near_duplicates([first, second])) == 1
+        ok = merged == merge
+        failed += not ok
+        print(f"{'PASS' if ok else 'FAIL'} {'merge' if merge else 'keep '} "
+              f"{similarity(first, second):.2f}  {first_title!r} / {second_title!r}")
+    print(f"threshold {app.NEAR_DUP_THRESHOLD}, {len(app._MINHASH_PERMS)} permutations, "
+          f"min shingles {app.NEAR_DUP_MIN_SHINGLES}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""التحقق من ترتيب الأخبار (rank_articles و score_article)
+
+  - العمر: الخبر الأقدم (pubDate) أقل درجة
+  - سمعة المصدر: لكل مصدر وزنه حتى لو تشارك التصنيف مع غيره
+  - التأكيد: الخبر الذي نقله أكثر من مصدر أعلى درجة
+
+يطبع PASS/FAIL لكل فحص ويخرج بـ 1 عند أي فشل.
+
+التشغيل:
+    python benchmarks/ranking_test.py
+"""
+import os
+import sys
+
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', 'benchmark')
+os.environ.setdefault('SENT_DB_PATH', ':memory:')
+os.environ.setdefault('FEED_CACHE_PATH', '')
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import app  # noqa: E402
+from bench_parse import make_rss  # noqa: E402
+
+
+def main():
+    results = []
+
+    def check(name, ok, detail):
+        results.append(ok)
+        print(f"{'PASS' if ok else 'FAIL'} {name}: {detail}")
+
+    # make_rss: الخبر i منشور في الدقيقة i، فالأحدث آخراً
+    articles = app.parse_rss_xml(make_rss(3), "bench")
+    scores = app.rank_articles(articles)
+    check("older pubDate ranks lower",
+          [a.id for a in sorted(articles, key=lambda a: scores[a.id])] == [a.id for a in articles],
+          [(a.time, round(scores[a.id], 3)) for a in articles])
+
+    registry = app.FeedRegistry()
+    registry.set_entries([
+        app.FeedEntry.from_dict({'url': 'http://a.example/rss', 'category': 'نفط', 'source': 'A', 'weight': 2}),
+        app.FeedEntry.from_dict({'url': 'http://b.example/rss', 'category': 'نفط', 'source': 'B', 'weight': 0.5}),
+    ])
+    check("source weights kept per source",
+          (registry.source_weight('A'), registry.source_weight('B')) == (2, 0.5), registry.source_weights)
+
+    article = articles[0]
+    single, corroborated = app.score_article(article, 1), app.score_article(article, 3)
+    check("corroborated story ranks higher", corroborated > single,
+          f"1 source {single:.3f}, 3 sources {corroborated:.3f}")
+
+    if not all(results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
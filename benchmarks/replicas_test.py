@@ -0,0 +1,159 @@
+"""تشغيل عدة نسخ من البوت على جهاز واحد والتحقق من عدم التكرار
+
+يشغّل خادم مصادر محلياً (نفس مصادر load_test) مع Bot API وهمي يسجل نص كل
+رسالة، ثم عدة عمليات من app تتشارك ملف تنسيق SQLite. كل النسخ تبدأ
+دوراتها في نفس المواعيد (كل --period ثانية)، ويمكن إيقاف نسخة بعد دورة
+لاختبار انتقال مصادرها لغيرها بعد انتهاء حجز عضويتها. في النهاية يطبع
+عدد مرات جلب كل مصدر والرسائل المكررة.
+
+التشغيل:
+    python benchmarks/replicas_test.py --replicas 3 --feeds 300 --cycles 3 --kill-after 1
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import collections
+import multiprocessing
+import urllib.request
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import load_test  # noqa: E402
+
+
+def run_stub_server(args, ready):
+    """المصادر + Bot API وهمي يسجل الرسائل + /stats"""
+    feeds = load_test.build_feeds(args)
+    hits = collections.Counter()
+    messages = []
+
+    async def feed(request):
+        hits[request.path] += 1
+        body, content_type, failing = feeds[request.path]
+        if failing:
+            return web.Response(status=500, text="error")
+        return web.Response(body=body, content_type=content_type)
+
+    async def bot_api(request):
+        method = request.match_info['method']
+        if method == 'getMe':
+            return web.json_response({'ok': True, 'result': {
+                'id': 1, 'is_bot': True, 'first_name': 'replicas', 'username': 'replicas_bot'}})
+        data = await request.post() if request.content_type != 'application/json' else await request.json()
+        messages.append((data.get('chat_id'), data.get('text')))
+        return web.json_response({'ok': True, 'result': {
+            'message_id': len(messages), 'date': int(time.time()),
+            'chat': {'id': 1, 'type': 'channel'}, 'text': ''}})
+
+    async def stats(request):
+        return web.json_response({'hits': hits, 'messages': messages, 'feeds': len(feeds)})
+
+    async def main():
+        stub = web.Application()
+        for path in feeds:
+            stub.router.add_get(path, feed)
+        stub.router.add_post('/bot{token}/{method}', bot_api)
+        stub.router.add_get('/stats', stats)
+        runner = web.AppRunner(stub, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, '127.0.0.1', args.port, backlog=4096).start()
+        ready.set()
+        await asyncio.Event().wait()
+
+    asyncio.run(main())
+
+
+def run_replica(n, args, coordination_path, start_at):
+    os.environ.update(
+        TELEGRAM_BOT_TOKEN='123:replicas',
+        SENT_DB_PATH=':memory:',  # مخزن محلي لكل نسخة: التنسيق وحده يمنع التكرار
+        FEED_CACHE_PATH='',
+        COORDINATION_URL=f"sqlite:///{coordination_path}",
+        INSTANCE_ID=f"replica-{n}",
+        LEASE_TTL=str(args.lease_ttl),
+        PARSE_MODE='inline',
+        TELEGRAM_API_URL=f"http://127.0.0.1:{args.port}",
+        TELEGRAM_CHAT_RATE='1000000',
+        TELEGRAM_GLOBAL_RATE='1000000',
+    )
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+    import app
+
+    app.feed_registry.set_entries([
+        app.FeedEntry(f"http://127.0.0.1:{args.port}{path}", f"source-{k}")
+        for k, path in enumerate(load_test.build_feeds(args))
+    ])
+
+    async def drive():
+        for queue in app.channels:
+            queue.start()
+        session = app.get_http_session()
+        for cycle in range(args.cycles):
+            cycle_at = start_at + cycle * args.period
+            # تجديد العضوية قبل الدورة ثم قراءة الأعضاء عند بدايتها
+            await asyncio.sleep(max(0, cycle_at - 0.5 - time.time()))
+            await app.coordinator.heartbeat()
+            await asyncio.sleep(max(0, cycle_at - time.time()))
+            await app.coordinator.heartbeat()
+            app.feed_registry.mark_all_due()
+            stats = await app.run_cycle(session)
+            print(f"replica-{n} cycle {cycle + 1}: {stats['feeds']} feeds, {stats['sent']} sent, "
+                  f"{len(app.coordinator.members)} members", flush=True)
+            if args.kill_after and n == 0 and cycle + 1 == args.kill_after:
+                print(f"replica-{n} stopping", flush=True)
+                os._exit(0)
+        await session.close()
+
+    asyncio.run(drive())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--replicas', type=int, default=3)
+    parser.add_argument('--feeds', type=int, default=300)
+    parser.add_argument('--items', type=int, default=10)
+    parser.add_argument('--cycles', type=int, default=3)
+    parser.add_argument('--kill-after', type=int, default=0, help='stop replica-0 after this cycle (0 = never)')
+    parser.add_argument('--lease-ttl', type=float, default=3)
+    parser.add_argument('--period', type=float, default=6, help='seconds between cycles (> lease ttl)')
+    parser.add_argument('--port', type=int, default=8950)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+    # نفس توزيع load_test بدون تأخير
+    args.latency, args.error_rate, args.malformed_rate = 0, 0.02, 0.02
+    args.html_rate, args.atom_rate = 0.1, 0.3
+
+    ready = multiprocessing.Event()
+    server = multiprocessing.Process(target=run_stub_server, args=(args, ready), daemon=True)
+    server.start()
+    ready.wait(60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start_at = time.time() + 5  # وقت لاستيراد app في كل نسخة
+        replicas = [
+            multiprocessing.Process(target=run_replica, args=(n, args, os.path.join(tmp, 'coord.db'), start_at))
+            for n in range(args.replicas)
+        ]
+        for replica in replicas:
+            replica.start()
+        for replica in replicas:
+            replica.join()
+
+    with urllib.request.urlopen(f"http://127.0.0.1:{args.port}/stats") as response:
+        stats = json.load(response)
+    server.terminate()
+
+    hits = collections.Counter(stats['hits'].values())
+    messages = [tuple(m) for m in stats['messages']]
+    duplicates = sum(count - 1 for count in collections.Counter(messages).values() if count > 1)
+    print(f"feeds {stats['feeds']}  fetches per feed {dict(sorted(hits.items()))} over {args.cycles} cycles")
+    print(f"messages {len(messages)}  duplicates {duplicates}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""اختبار حمل لنقاط الويب (/ و /health و /check و /metrics و /test-channel)
+
+يشغّل app في عملية منفصلة (خادم الويب وطوابير الإرسال وعامل الفحص اليدوي
+على حلقة واحدة كما في main) مع خادم مصادر و Bot API وهمي من load_test، ثم
+يرسل الطلبات بمعدل ثابت (مئات في الثانية) ويطبع لكل نقطة عدد الطلبات
+ورموز الحالة وزمن الاستجابة (p50/p99/max)، وتأخر حلقة البوت من /metrics.
+يخرج بـ 1 إذا فشل أي طلب.
+
+التشغيل:
+    python benchmarks/web_load_test.py --rate 500 --duration 10
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import collections
+import multiprocessing
+
+import aiohttp
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import load_test  # noqa: E402
+
+# نسبة كل نقطة من الطلبات (test-channel يرسل رسالة فعلية إلى Bot API الوهمي)
+ENDPOINTS = (("/", 3), ("/health", 4), ("/check", 2), ("/metrics", 1), ("/test-channel", 1))
+
+
+def run_bot(args, ready):
+    """app كما في main لكن بدون حلقة الأخبار (عملية منفصلة)"""
+    os.environ.update(
+        TELEGRAM_BOT_TOKEN='123:webload',
+        SENT_DB_PATH=':memory:',
+        FEED_CACHE_PATH='',
+        PORT=str(args.port),
+        TELEGRAM_API_URL=f"http://127.0.0.1:{args.stub_port}",
+        TELEGRAM_CHAT_RATE='1000000',
+        TELEGRAM_GLOBAL_RATE='1000000',
+    )
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+    import app
+
+    app.feed_registry.set_entries([
+        app.FeedEntry(f"http://127.0.0.1:{args.stub_port}{path}", f"source-{n}")
+        for n, path in enumerate(load_test.build_feeds(args))
+    ])
+
+    async def serve():
+        await app.start_web_server()
+        for queue in app.channels:
+            queue.start()
+        asyncio.create_task(app.manual_check_worker())
+        asyncio.create_task(app.loop_lag_probe())
+        ready.set()
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+def _loop_lag(metrics_text):
+    """متوسط وأقصى فئة لتأخر الحلقة من نص /metrics"""
+    total = count = 0.0
+    worst = "0"
+    for line in metrics_text.splitlines():
+        if line.startswith('newsbot_loop_lag_seconds_sum'):
+            total = float(line.split()[-1])
+        elif line.startswith('newsbot_loop_lag_seconds_count'):
+            count = float(line.split()[-1])
+    previous = None
+    for line in metrics_text.splitlines():
+        if line.startswith('newsbot_loop_lag_seconds_bucket'):
+            value = float(line.split()[-1])
+            if previous is not None and value > previous:
+                worst = line.split('le="', 1)[1].split('"', 1)[0]
+            previous = value
+    return (total / count if count else 0.0), worst
+
+
+async def hammer(args):
+    base = f"http://127.0.0.1:{args.port}"
+    schedule = [path for path, share in ENDPOINTS for _ in range(share)]
+    latencies = collections.defaultdict(list)
+    statuses = collections.defaultdict(collections.Counter)
+    connector = aiohttp.TCPConnector(limit=args.connections)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=60)) as session:
+
+        async def request(path):
+            started = time.perf_counter()
+            try:
+                async with session.get(base + path) as response:
+                    await response.read()
+                    statuses[path][response.status] += 1
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                statuses[path][type(e).__name__] += 1
+            latencies[path].append(time.perf_counter() - started)
+
+        # معدل ثابت (حلقة مفتوحة): الطلب التالي في موعده مهما تأخرت الردود
+        total = int(args.rate * args.duration)
+        tasks = []
+        started = time.perf_counter()
+        for i in range(total):
+            delay = started + i / args.rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(request(schedule[i % len(schedule)])))
+        await asyncio.gather(*tasks)
+        wall = time.perf_counter() - started
+
+        async with session.get(base + "/metrics") as response:
+            metrics_text = await response.text()
+
+    failed = 0
+    print(f"{total} requests in {wall:.2f} s ({total / wall:,.0f} req/s, target {args.rate:,.0f})")
+    for path, _ in ENDPOINTS:
+        values = sorted(latencies[path])
+        if not values:
+            continue
+        codes = dict(statuses[path])
+        failed += sum(count for code, count in codes.items() if code != 200)
+        print(f"  {path:14} {len(values):6}  status {codes}  p50 {values[len(values) // 2] * 1000:6.1f} ms  "
+              f"p99 {values[int(len(values) * 0.99)] * 1000:6.1f} ms  max {values[-1] * 1000:6.1f} ms")
+    mean_lag, worst_lag = _loop_lag(metrics_text)
+    print(f"  bot loop lag mean {mean_lag * 1000:.1f} ms  worst bucket <= {worst_lag} s")
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rate', type=float, default=500, help='requests per second')
+    parser.add_argument('--duration', type=float, default=10, help='seconds')
+    parser.add_argument('--connections', type=int, default=100)
+    parser.add_argument('--feeds', type=int, default=20, help='stub feeds (used by /check)')
+    parser.add_argument('--items', type=int, default=30)
+    parser.add_argument('--port', type=int, default=8980)
+    parser.add_argument('--stub-port', type=int, default=8981)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+    # مصادر load_test بدون أخطاء على عنوان واحد
+    args.latency, args.error_rate, args.malformed_rate = 0.05, 0, 0
+    args.html_rate, args.atom_rate, args.hosts = 0.1, 0.3, 1
+
+    stub_args = argparse.Namespace(**{**vars(args), 'port': args.stub_port})
+    stub_ready, bot_ready = multiprocessing.Event(), multiprocessing.Event()
+    stub = multiprocessing.Process(target=load_test.run_stub_server, args=(stub_args, stub_ready), daemon=True)
+    stub.start()
+    stub_ready.wait(60)
+    bot = multiprocessing.Process(target=run_bot, args=(args, bot_ready), daemon=True)
+    bot.start()
+    bot_ready.wait(60)
+
+    try:
+        failed = asyncio.run(hammer(args))
+    finally:
+        bot.terminate()
+        stub.terminate()
+    if failed:
+        print(f"FAIL {failed} requests did not return 200")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()